@@ -1,17 +1,109 @@
 import os
 import ast
+import atexit
+import builtins
+import hashlib
+import io
 import json
+import logging
+import queue
+import re
+import shutil
+import stat
 import tempfile
-import subprocess
-from flask import Flask, render_template, request, jsonify
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from functools import lru_cache
+from operator import itemgetter
+from flask import Flask, Response, render_template, request, jsonify
+from flask.json.provider import DefaultJSONProvider
+from itsdangerous import BadSignature, URLSafeSerializer
+import httpx
 from anthropic import Anthropic
 from dotenv import load_dotenv
 
+from ast_visitor import run_ast_analysis
+
+try:
+    # pylint runs in-process: launching the pylint CLI per request paid for a
+    # process start plus pylint's imports and astroid warm-up every time
+    from pylint.lint import Run as PylintRun
+    from pylint.reporters import JSONReporter
+    from astroid import MANAGER as ASTROID_MANAGER
+except ImportError:
+    PylintRun = None
+
+try:
+    from diskcache import Cache
+except ImportError:
+    Cache = None
+
+try:
+    # orjson parses pylint's reports and serializes responses a few times
+    # faster than the json module
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    json_loads = json.loads
+
 # Load environment variables from .env file
 load_dotenv()
 
+# Only warnings and errors are logged unless LOG_LEVEL says otherwise, so the
+# per-issue debug messages cost nothing in production
+LOG_LEVEL = (os.environ.get('LOG_LEVEL') or 'WARNING').upper()
+# A typo in LOG_LEVEL shouldn't keep the app from starting
+log_level_known = isinstance(logging.getLevelName(LOG_LEVEL), int)
+logging.basicConfig(level=LOG_LEVEL if log_level_known else logging.WARNING)
+logger = logging.getLogger(__name__)
+if not log_level_known:
+    logger.warning("Unknown LOG_LEVEL %r, logging warnings and errors only", LOG_LEVEL)
+
 app = Flask(__name__)
 
+if orjson is not None:
+    class OrjsonProvider(DefaultJSONProvider):
+        """Serialize responses with orjson; parsing and options beyond `default` are unchanged."""
+        
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj, default=kwargs.get('default', self.default)).decode()
+    
+    app.json = OrjsonProvider(app)
+
+# Explanation requests are network-bound, so they're dispatched concurrently.
+# The pool is shared across requests to cap in-flight Claude calls and stay
+# under the API rate limits.
+MAX_EXPLANATION_WORKERS = 8
+explanation_executor = ThreadPoolExecutor(max_workers=MAX_EXPLANATION_WORKERS)
+
+# Seconds /analyze waits for explanations before answering without the
+# missing ones; leaves room for the analysis within Vercel's 10s limit
+EXPLANATION_TIMEOUT = 7
+
+# Seconds the analysis waits for its pylint report before going on with the
+# AST findings alone; together with EXPLANATION_TIMEOUT it stays within
+# Vercel's 10s limit
+PYLINT_TIMEOUT = 2
+
+# Larger inputs only get the AST checks; pylint's run time grows with the code
+# and would dominate the request
+MAX_PYLINT_CODE_SIZE = 100_000
+
+# /analyze/deep only goes through the (slower, half price) Message Batches API
+# when there are at least this many issues to explain
+DEEP_ANALYSIS_BATCH_THRESHOLD = 5
+
+def warm_anthropic_connection(client):
+    """Make a cheap API call so the client's connection pool has a live connection."""
+    try:
+        client.models.list(limit=1)
+        logger.debug("Anthropic connection pool warmed")
+    except Exception as e:
+        logger.debug("Could not warm Anthropic connection pool: %s", e)
+
 # Initialize Anthropic client
 # Note: You'll need to set the ANTHROPIC_API_KEY environment variable
 anthropicClient = None
@@ -23,30 +115,239 @@ try:
     # If not found, try with VERCEL_ANTHROPIC_API_KEY (for Vercel)
     if not api_key:
         api_key = os.environ.get('VERCEL_ANTHROPIC_API_KEY')
+        if api_key:
+            logger.info("Using VERCEL_ANTHROPIC_API_KEY instead of ANTHROPIC_API_KEY")
     
-    print(f"API key available in app.py: {bool(api_key)}")
+    logger.debug("API key available: %s", bool(api_key))
     
     if not api_key:
-        print("No API key found in environment variables in app.py")
+        logger.warning("No API key found in environment variables")
+        logger.warning("Checked both ANTHROPIC_API_KEY and VERCEL_ANTHROPIC_API_KEY")
     else:
+        # Sanity-check the key format offline rather than spending a Claude
+        # call (and a cold-start round-trip) on every boot
+        if not api_key.strip().startswith('sk-ant-'):
+            logger.warning("ANTHROPIC_API_KEY does not look like an Anthropic key")
+        
         # Initialize with direct API key parameter
-        anthropicClient = Anthropic(api_key=api_key.strip())
-        print("Anthropic client initialized successfully in app.py")
+        # Reuse pooled keep-alive HTTP/2 connections across all Claude calls so
+        # back-to-back and concurrent requests skip the TLS handshake
+        http_client = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+            timeout=httpx.Timeout(30.0, connect=5.0)
+        )
+        # One retry keeps a transient failure from surfacing to the user
+        # without letting a struggling API stretch a request past its deadline
+        anthropicClient = Anthropic(api_key=api_key.strip(), http_client=http_client, max_retries=1)
+        logger.info("Anthropic client initialized successfully")
         
-        # Test the client with a simple request to verify it works
-        try:
-            response = anthropicClient.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=10,
-                messages=[{"role": "user", "content": "Test"}]
-            )
-            print("Anthropic client test successful in app.py")
-        except Exception as test_error:
-            print(f"Anthropic client test failed in app.py: {str(test_error)}")
-            anthropicClient = None
+        # Open the first pooled connection in the background so the first
+        # user request doesn't pay for DNS and the TLS handshake
+        threading.Thread(target=warm_anthropic_connection, args=(anthropicClient,), daemon=True).start()
 except Exception as e:
-    print(f"Failed to initialize Anthropic client in app.py: {str(e)}")
-    print("AI explanations will not be available.")
+    logger.error("Failed to initialize Anthropic client: %s", e)
+    logger.warning("AI explanations will not be available.")
+
+# Deep analysis job ids are signed batch ids, so /analyze/deep/<job_id> only
+# serves batches this app created. SECRET_KEY signs them if set; otherwise the
+# Anthropic key does, which every instance already shares.
+job_id_serializer = None
+if anthropicClient is not None:
+    job_id_serializer = URLSafeSerializer(os.environ.get('SECRET_KEY') or api_key.strip(), salt='deep-analysis-job')
+
+# pylint and astroid keep global state, so only one pylint run at a time per process
+_pylint_lock = threading.Lock()
+
+# (pid, path) of this process's pylint scratch directory. The pid is checked
+# on every call so forked workers (e.g. gunicorn --preload) each get their own.
+_pylint_scratch = None
+
+def get_pylint_scratch_dir():
+    """Return this process's pylint scratch directory, creating it and registering its cleanup on first use."""
+    global _pylint_scratch
+    pid = os.getpid()
+    if _pylint_scratch is None or _pylint_scratch[0] != pid:
+        # mkdtemp picks an unguessable name and creates the directory
+        # private to this user, so nothing else can plant files or symlinks in it
+        path = tempfile.mkdtemp(prefix='pha_')
+        atexit.register(shutil.rmtree, path, True)
+        _pylint_scratch = (pid, path)
+    return _pylint_scratch[1]
+
+def lint_batch(codes):
+    """Lint several snippets in a single in-process pylint run and return each snippet's pylint messages."""
+    # Unguessable module names, so a snippet can't import the other snippets
+    # linted alongside it
+    modules = [f'snip_{uuid.uuid4().hex}' for _ in codes]
+    output = io.StringIO()
+    with _pylint_lock:
+        # pylint lints files by path, so each snippet is written to this
+        # process's scratch directory for the length of the run
+        scratch_dir = get_pylint_scratch_dir()
+        paths = [os.path.join(scratch_dir, module_name + '.py') for module_name in modules]
+        try:
+            for path, code in zip(paths, codes):
+                with open(path, 'wb') as scratch_file:
+                    scratch_file.write(code.encode('utf-8'))
+            
+            PylintRun(paths, reporter=JSONReporter(output), exit=False)
+        finally:
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            # astroid caches every module it parses; drop these so they don't
+            # pile up over the life of the process
+            for module_name in modules:
+                ASTROID_MANAGER.astroid_cache.pop(module_name, None)
+    
+    messages = {module_name: [] for module_name in modules}
+    for msg in json_loads(output.getvalue()):
+        # Skip messages that aren't about a snippet, e.g. warnings about a
+        # pylint config file picked up from the working directory
+        module_messages = messages.get(msg['module'])
+        if module_messages is not None:
+            module_messages.append(msg)
+    return [messages[module_name] for module_name in modules]
+
+def assigns_attributes(tree):
+    """Return True if the code assigns to an attribute of anything but self or cls.
+    
+    astroid records `target.name = ...` on whatever target infers to, which
+    can be a module or class in its shared cache (e.g. `os.foo = 1` makes
+    every later `os.foo` look defined), so such code is linted on its own
+    and the cache is cleared afterwards.
+    """
+    for node in ast.walk(tree):
+        if type(node) is ast.Attribute and type(node.ctx) is ast.Store:
+            value = node.value
+            if type(value) is not ast.Name or value.id not in ('self', 'cls'):
+                return True
+    return False
+
+class PylintBatcher:
+    """Runs pylint on a background thread, linting all the snippets queued since its last run together.
+    
+    Most of a pylint run on a small snippet is per-run setup, so when requests
+    arrive together one run over all their code is much cheaper than one run each.
+    """
+    
+    def __init__(self, max_batch=16):
+        self.max_batch = max_batch
+        self._jobs = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+    
+    def submit(self, code, isolated=False):
+        """Queue code for linting and return a Future of its pylint messages.
+        
+        Isolated code is linted in a run of its own rather than batched.
+        """
+        future = Future()
+        self._get_jobs().put((code, isolated, future))
+        return future
+    
+    def _get_jobs(self):
+        # Threads don't survive a fork, so each worker process starts its own
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self._jobs = queue.Queue()
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, args=(self._jobs,), daemon=True).start()
+            return self._jobs
+    
+    def _run(self, jobs):
+        # An isolated job met while filling a batch waits to start the next one
+        held = None
+        while True:
+            # Rather than waiting a fixed time for a batch to fill, lint
+            # whatever queued up while the previous batch was running; a lone
+            # request is linted right away
+            batch = [held if held is not None else jobs.get()]
+            held = None
+            while not batch[0][1] and len(batch) < self.max_batch:
+                try:
+                    job = jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job[1]:
+                    held = job
+                    break
+                batch.append(job)
+            
+            # Skip jobs whose request stopped waiting and cancelled them
+            batch = [job for job in batch if job[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            
+            try:
+                results = lint_batch([code for code, _, _ in batch])
+            except BaseException as e:
+                # pylint raises SystemExit on some errors (e.g. a bad config
+                # file). Fail this batch with an ordinary exception, so it
+                # doesn't escape the request's error handling either, and keep
+                # the thread alive for the next batch.
+                if not isinstance(e, Exception):
+                    e = RuntimeError(f'pylint exited ({e!r})')
+                for _, _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, _, future), messages in zip(batch, results):
+                    future.set_result(messages)
+            
+            if batch[0][1]:
+                # An isolated snippet may have changed modules in astroid's
+                # shared cache, so clear it before the next run. Doing it after
+                # the result is handed back keeps it off that request's time.
+                try:
+                    with _pylint_lock:
+                        ASTROID_MANAGER.clear_cache()
+                except Exception as e:
+                    logger.error("Error clearing the astroid cache: %s", e)
+
+pylint_batcher = PylintBatcher()
+
+# Node types that a lone literal expression (e.g. a module docstring) is made of
+LITERAL_NODE_TYPES = frozenset({ast.Constant, ast.List, ast.Tuple, ast.Set, ast.Dict, ast.Load})
+
+def is_literal_only(tree):
+    """Return True if a module is empty or a single literal expression, which pylint has no errors to report for."""
+    if not tree.body:
+        return True
+    if len(tree.body) > 1 or type(tree.body[0]) is not ast.Expr:
+        return False
+    return all(type(node) in LITERAL_NODE_TYPES for node in ast.walk(tree.body[0].value))
+
+def start_pylint(code, tree):
+    """Queue code (parsed as tree) for pylint and return a Future of its messages, or None if pylint is skipped."""
+    if PylintRun is None:
+        # pylint is not installed
+        logger.warning("pylint not found in environment, skipping pylint analysis")
+        return None
+    if len(code) > MAX_PYLINT_CODE_SIZE:
+        logger.info("Code is %d characters, skipping pylint analysis", len(code))
+        return None
+    return pylint_batcher.submit(code, isolated=assigns_attributes(tree))
+
+# Categorize pylint issues by certainty
+DEFINITE_ERROR_SYMBOLS = frozenset({
+    'undefined-variable', 'used-before-assignment',
+    'no-member', 'not-callable', 'unexpected-keyword-arg',
+    'too-many-function-args', 'too-few-function-args',
+    'invalid-sequence-index', 'invalid-slice-index',
+    'attribute-error', 'import-error', 'no-name-in-module',
+    'return-outside-function', 'yield-outside-function',
+    'continue-outside-loop', 'break-outside-loop'
+})
+
+POTENTIAL_ERROR_SYMBOLS = frozenset({
+    'missing-kwoa', 'unsupported-assignment-operation', 
+    'unsupported-delete-operation', 'unsupported-membership-test', 
+    'unsubscriptable-object', 'undefined-loop-variable',
+    'return-arg-in-generator', 'nonlocal-without-binding'
+})
 
 class PythonHabitAnalyzer:
     """Analyzes Python code for actual runtime issues and bugs with context awareness."""
@@ -68,186 +369,10 @@ class PythonHabitAnalyzer:
     
     def analyze(self, code):
         """Run all analysis methods on the provided code with context awareness."""
-        self.feedback = []
-        self.context = {}
-        self.variables = {}
-        self.functions = {}
-        self.control_flow = []
-        
-        # First pass: build context (variables, functions, control flow)
-        try:
-            tree = ast.parse(code)
-            self._build_context(tree)
-        except SyntaxError:
-            # If syntax error, we'll catch it in the analysis phase
-            pass
-        
-        # Second pass: run analysis with context awareness
-        self._run_ast_analysis(code)
-        
-        # Run pylint analysis but filter for only serious issues
-        self._run_pylint_analysis(code)
-        
-        return self.feedback
-        
-    def _build_context(self, tree):
-        """Build context by analyzing the code structure first."""
-        # Collect all variable assignments
-        for node in ast.walk(tree):
-            # Track variable assignments
-            if isinstance(node, ast.Assign):
-                for target in node.targets:
-                    if isinstance(target, ast.Name):
-                        var_name = target.id
-                        # Track if the variable is reassigned
-                        self.variables[var_name] = self.variables.get(var_name, 0) + 1
-            
-            # Track function definitions and their usage
-            elif isinstance(node, ast.FunctionDef):
-                func_name = node.name
-                self.functions[func_name] = {
-                    'node': node,
-                    'calls': 0,
-                    'has_return': False,
-                    'has_break': False,
-                    'has_mutable_defaults': False,
-                    'exception_handlers': []
-                }
-                
-                # Check for returns in the function
-                for subnode in ast.walk(node):
-                    if isinstance(subnode, ast.Return):
-                        self.functions[func_name]['has_return'] = True
-                    elif isinstance(subnode, ast.Break):
-                        self.functions[func_name]['has_break'] = True
-                    elif isinstance(subnode, ast.ExceptHandler):
-                        self.functions[func_name]['exception_handlers'].append(subnode)
-                
-                # Check for mutable defaults
-                for arg in node.args.defaults:
-                    if isinstance(arg, (ast.List, ast.Dict, ast.Set)):
-                        self.functions[func_name]['has_mutable_defaults'] = True
-            
-            # Track function calls
-            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
-                func_name = node.func.id
-                if func_name in self.functions:
-                    self.functions[func_name]['calls'] += 1
-            
-            # Track loops and conditionals for control flow analysis
-            elif isinstance(node, (ast.For, ast.While, ast.If)):
-                self.control_flow.append(node)
-    
-    def _run_pylint_analysis(self, code):
-        """Run pylint on the code and extract only critical messages with uncertainty levels."""
-        temp_file_path = None
-        try:
-            # Create a temporary file to store the code
-            with tempfile.NamedTemporaryFile(suffix='.py', delete=False) as temp_file:
-                temp_file_path = temp_file.name
-                temp_file.write(code.encode('utf-8'))
-            
-            try:
-                # Run pylint on the temporary file
-                cmd = ['pylint', '--output-format=json', temp_file_path]
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                
-                # Process pylint output
-                if result.stdout:
-                    try:
-                        pylint_results = json.loads(result.stdout)
-                        for msg in pylint_results:
-                            message_type = msg.get('type', '').lower()
-                            message = msg.get('message', '')
-                            line = msg.get('line', 0)
-                            symbol = msg.get('symbol', '')
-                            
-                            # Categorize issues by certainty
-                            definite_error_symbols = [
-                                'undefined-variable', 'used-before-assignment',
-                                'no-member', 'not-callable', 'unexpected-keyword-arg',
-                                'too-many-function-args', 'too-few-function-args',
-                                'invalid-sequence-index', 'invalid-slice-index',
-                                'attribute-error', 'import-error', 'no-name-in-module',
-                                'return-outside-function', 'yield-outside-function',
-                                'continue-outside-loop', 'break-outside-loop'
-                            ]
-                            
-                            potential_error_symbols = [
-                                'missing-kwoa', 'unsupported-assignment-operation', 
-                                'unsupported-delete-operation', 'unsupported-membership-test', 
-                                'unsubscriptable-object', 'undefined-loop-variable',
-                                'return-arg-in-generator', 'nonlocal-without-binding'
-                            ]
-                            
-                            # Determine certainty level based on context
-                            # Determine category based on message type and symbol
-                            if message_type == 'error' or symbol in definite_error_symbols:
-                                category = self.RUNTIME_ERROR
-                            elif symbol in potential_error_symbols:
-                                # Check context to see if this might be intentional
-                                # For example, if a variable is used in multiple places, it's less likely to be a typo
-                                if symbol == 'undefined-variable':
-                                    var_name = message.split("'")
-                                    if len(var_name) > 1 and var_name[1] in self.variables:
-                                        category = self.POTENTIAL_ERROR
-                                    else:
-                                        category = self.RUNTIME_ERROR
-                                else:
-                                    category = self.POTENTIAL_ERROR
-                            else:
-                                category = self.BAD_HABIT
-                            
-                            if message_type == 'error' or symbol in definite_error_symbols or symbol in potential_error_symbols:
-                                self.feedback.append({
-                                    'line': line,
-                                    'message': message,
-                                    'is_bad_habit': True,
-                                    'category': category,
-                                    'source': 'pylint'
-                                })
-                    except json.JSONDecodeError:
-                        self.feedback.append({
-                            'line': 0,
-                            'message': 'Failed to parse pylint output',
-                            'is_bad_habit': False,
-                            'category': self.RUNTIME_ERROR,
-                            'source': 'system'
-                        })
-            except FileNotFoundError:
-                # pylint is not installed or not in PATH
-                print("pylint not found in environment, skipping pylint analysis")
-                # Skip pylint analysis silently in production
-                pass
-            except Exception as e:
-                # Other errors
-                self.feedback.append({
-                    'line': 0,
-                    'message': f'Error running pylint: {str(e)}',
-                    'is_bad_habit': False,
-                    'category': self.RUNTIME_ERROR,
-                    'source': 'system'
-                })
-        finally:
-            # Clean up the temporary file
-            if temp_file_path and os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
-    
-    def _run_ast_analysis(self, code):
-        """Analyze code using Python's AST module for critical runtime issues with context awareness."""
         try:
-            # Parse the code into an AST
             tree = ast.parse(code)
-            
-            # Run various custom checks for actual runtime issues with context awareness
-            self._check_mutable_defaults(tree)
-            self._check_infinite_loops(tree)
-            self._check_exception_handling(tree)
-            self._check_resource_management(tree)
-            self._check_unreachable_code(tree)
-            self._check_shadowing_builtins(tree)
-            
         except SyntaxError as e:
+            self._reset()
             self.feedback.append({
                 'line': e.lineno if hasattr(e, 'lineno') else 0,
                 'message': f'Syntax error: {str(e)}',
@@ -255,581 +380,928 @@ class PythonHabitAnalyzer:
                 'category': self.SYNTAX_ERROR,
                 'source': 'ast'
             })
-        except Exception as e:
-            self.feedback.append({
-                'line': 0,
-                'message': f'Error during AST analysis: {str(e)}',
-                'is_bad_habit': False,
-                'category': self.RUNTIME_ERROR,
-                'source': 'system'
-            })
+            # pylint can't parse it either; it would only repeat the syntax error
+            return self.feedback
+        
+        return self.analyze_tree(tree, code)
     
-    def _check_mutable_defaults(self, tree):
-        """Check for functions with mutable default arguments which cause unexpected behavior."""
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                func_name = node.name
-                has_mutable_defaults = False
-                for arg in node.args.defaults:
-                    if isinstance(arg, (ast.List, ast.Dict, ast.Set)):
-                        has_mutable_defaults = True
-                        
-                        # Check if this might be intentional by looking at function usage
-                        category = self.RUNTIME_ERROR  # Default to runtime error
-                        
-                        # If the function is in our context and we have info about it
-                        if func_name in self.functions:
-                            func_info = self.functions[func_name]
-                            
-                            # If the function reassigns the mutable default, it might be intentional
-                            reassigns_default = False
-                            for i, arg_node in enumerate(node.args.args):
-                                if i < len(node.args.defaults) and isinstance(arg_node, ast.arg):
-                                    arg_name = arg_node.arg
-                                    # Check if this argument is reassigned in the function body
-                                    for subnode in ast.walk(node):
-                                        if isinstance(subnode, ast.Assign):
-                                            for target in subnode.targets:
-                                                if isinstance(target, ast.Name) and target.id == arg_name:
-                                                    reassigns_default = True
-                                                    break
-                            
-                            # If the function is called multiple times or reassigns the default
-                            if func_info['calls'] > 1 or reassigns_default:
-                                category = self.POTENTIAL_ERROR
-                            # If it's a common pattern but not causing issues yet
-                            else:
-                                category = self.BAD_HABIT
-                                
-                        self.feedback.append({
-                            'line': node.lineno,
-                            'message': f'Function "{node.name}" uses mutable default argument ([], {{}}, or set()). This will be shared across all function calls, causing unexpected behavior when modified.',
-                            'is_bad_habit': True,
-                            'category': category,
-                            'source': 'ast'
-                        })
-    
-    def _check_infinite_loops(self, tree):
-        """Check for potential infinite loops with context awareness."""
-        for node in ast.walk(tree):
-            # Check for while loops with constant True condition
-            if isinstance(node, ast.While) and isinstance(node.test, ast.Constant):
-                if node.test.value is True:
-                    # Check if there's a break statement in the loop body
-                    has_break = False
-                    has_return = False
-                    has_raise = False
-                    has_sys_exit = False
-                    
-                    for child in ast.walk(node):
-                        if isinstance(child, ast.Break):
-                            has_break = True
-                            break
-                        elif isinstance(child, ast.Return):
-                            has_return = True
-                            break
-                        elif isinstance(child, ast.Raise):
-                            has_raise = True
-                            break
-                        # Check for sys.exit() calls
-                        elif (isinstance(child, ast.Call) and 
-                              isinstance(child.func, ast.Attribute) and 
-                              child.func.attr == 'exit'):
-                            has_sys_exit = True
-                            break
-                    
-                    # Determine category based on context
-                    if not (has_break or has_return or has_raise or has_sys_exit):
-                        # Check if there's any complex condition that might be an exit condition
-                        has_complex_condition = False
-                        for child in ast.walk(node):
-                            if isinstance(child, ast.If):
-                                has_complex_condition = True
-                                break
-                        
-                        # If no exit condition is found, it's a fatal error
-                        # If there's a complex condition, it might be intentional
-                        category = self.POTENTIAL_ERROR if has_complex_condition else self.FATAL_ERROR
-                        
-                        self.feedback.append({
-                            'line': node.lineno,
-                            'message': 'Infinite loop detected (while True without break). This will cause your program to hang indefinitely.',
-                            'is_bad_habit': True,
-                            'category': category,
-                            'source': 'ast'
-                        })
-    
-    def _check_exception_handling(self, tree):
-        """Check for overly broad exception handling with context awareness."""
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ExceptHandler):
-                if node.type is None or (isinstance(node.type, ast.Name) and node.type.id == 'Exception'):
-                    # Check if the except block is just passing or too generic
-                    is_just_pass = False
-                    has_logging = False
-                    has_print = False
-                    has_reraise = False
-                    
-                    # Check the body of the except handler
-                    if len(node.body) == 1 and isinstance(node.body[0], ast.Pass):
-                        is_just_pass = True
-                    
-                    # Look for logging, printing, or re-raising in the except block
-                    for stmt in node.body:
-                        # Check for logging calls
-                        if isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call):
-                            if (isinstance(stmt.value.func, ast.Attribute) and 
-                                stmt.value.func.attr in ['debug', 'info', 'warning', 'error', 'critical', 'exception']):
-                                has_logging = True
-                            # Check for print calls
-                            elif isinstance(stmt.value.func, ast.Name) and stmt.value.func.id == 'print':
-                                has_print = True
-                        # Check for re-raising
-                        elif isinstance(stmt, ast.Raise):
-                            has_reraise = True
-                    
-                    # Determine category based on context
-                    if is_just_pass:
-                        # Bare except with pass is always bad
-                        category = self.RUNTIME_ERROR
-                        
-                        # If it's in a try-except-finally block with cleanup, might be intentional
-                        parent = getattr(node, 'parent', None)
-                        if parent and hasattr(parent, 'finalbody') and parent.finalbody:
-                            category = self.BAD_HABIT
-                            
-                        self.feedback.append({
-                            'line': node.lineno,
-                            'message': 'Catching all exceptions with a bare except: pass will silence critical errors, making bugs extremely difficult to diagnose.',
-                            'is_bad_habit': True,
-                            'category': category,
-                            'source': 'ast'
-                        })
-                    else:
-                        # If there's logging, printing, or re-raising, it might be intentional
-                        if has_logging or has_print or has_reraise:
-                            category = self.BAD_HABIT
-                        else:
-                            # Generic exception handling without proper handling is a potential error
-                            category = self.POTENTIAL_ERROR
-                        
-                        self.feedback.append({
-                            'line': node.lineno,
-                            'message': 'Catching all exceptions with a bare except or except Exception can mask critical errors. Catch specific exceptions instead.',
-                            'is_bad_habit': True,
-                            'category': category,
-                            'source': 'ast'
-                        })
-    
-    def _check_resource_management(self, tree):
-        """Check for proper resource management (files, connections, etc.) with context awareness."""
-        # Track file objects and their close calls
-        file_vars = {}
+    def _run_pylint_analysis(self, pylint_job):
+        """Collect a pylint run's messages and extract only critical messages with uncertainty levels."""
+        if pylint_job is None:
+            # pylint was skipped
+            return
         
-        for node in ast.walk(tree):
-            # Track assignments of open() calls to variables
-            if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
-                if isinstance(node.value, ast.Call) and isinstance(node.value.func, ast.Name) and node.value.func.id == 'open':
-                    var_name = node.targets[0].id
-                    file_vars[var_name] = {'node': node, 'closed': False}
-            
-            # Track close() calls on file variables
-            elif isinstance(node, ast.Expr) and isinstance(node.value, ast.Call):
-                if isinstance(node.value.func, ast.Attribute) and node.value.func.attr == 'close':
-                    if isinstance(node.value.func.value, ast.Name):
-                        var_name = node.value.func.value.id
-                        if var_name in file_vars:
-                            file_vars[var_name]['closed'] = True
-            
-            # Check for file operations without context managers
-            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
-                if node.func.id == 'open':
-                    # Check if this open call is part of a with statement
-                    is_in_with = False
-                    parent = getattr(node, 'parent', None)
-                    while parent:
-                        if isinstance(parent, ast.With):
-                            is_in_with = True
-                            break
-                        parent = getattr(parent, 'parent', None)
-                    
-                    # If not in a with statement and not directly assigned to a variable that's later closed
-                    if not is_in_with and not (hasattr(node, 'parent') and 
-                                              isinstance(node.parent, ast.Assign) and 
-                                              len(node.parent.targets) == 1 and 
-                                              isinstance(node.parent.targets[0], ast.Name) and
-                                              node.parent.targets[0].id in file_vars and
-                                              file_vars[node.parent.targets[0].id]['closed']):
-                        
-                        # Determine category based on context
-                        category = self.RUNTIME_ERROR  # Default to runtime error
-                        
-                        # If it's in a function that has a try-finally, might be closed there
-                        parent_func = None
-                        parent = getattr(node, 'parent', None)
-                        while parent:
-                            if isinstance(parent, ast.FunctionDef):
-                                parent_func = parent
-                                break
-                            parent = getattr(parent, 'parent', None)
-                        
-                        if parent_func:
-                            for child in ast.walk(parent_func):
-                                if isinstance(child, ast.Try) and child.finalbody:
-                                    # If there's a try-finally, it's more likely a bad habit than an error
-                                    category = self.BAD_HABIT
-                                    break
-                        else:
-                            # If not in a function with try-finally, it's a potential resource leak
-                            category = self.POTENTIAL_ERROR
-                        
-                        self.feedback.append({
-                            'line': node.lineno,
-                            'message': 'File opened without using a context manager (with statement). This can lead to resource leaks if the file is not properly closed.',
-                            'is_bad_habit': True,
-                            'category': category,
-                            'source': 'ast'
-                        })
-    
-    def _check_unreachable_code(self, tree):
-        """Check for unreachable code after return/break/continue statements with context awareness."""
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.For, ast.While)):
-                # Check for statements after return/break/continue
-                has_unreachable = False
-                has_return_break_continue = False
-                unreachable_line = 0
-                
-                for i, stmt in enumerate(node.body):
-                    if has_return_break_continue and i < len(node.body) - 1:
-                        has_unreachable = True
-                        unreachable_line = getattr(node.body[i], 'lineno', node.lineno)
-                        break
-                    
-                    # Check if this statement is a return/break/continue
-                    if isinstance(stmt, (ast.Return, ast.Break, ast.Continue)):
-                        has_return_break_continue = True
+        try:
+            for msg in pylint_job.result(timeout=PYLINT_TIMEOUT):
+                message_type = msg.get('type', '').lower()
+                message = msg.get('message', '')
+                line = msg.get('line', 0)
+                symbol = msg.get('symbol', '')
                 
-                if has_unreachable:
-                    # Default category - this is a bad habit but not necessarily an error
-                    category = self.BAD_HABIT
-                    
-                    # Check what kind of unreachable code it is
-                    unreachable_stmts = []
-                    for i, stmt in enumerate(node.body):
-                        if has_return_break_continue and i > node.body.index(stmt):
-                            unreachable_stmts.append(stmt)
-                    
-                    # If the unreachable code contains important operations, it's more serious
-                    for stmt in unreachable_stmts:
-                        if isinstance(stmt, (ast.Assign, ast.AugAssign, ast.Call)):
-                            # Important operations that will never execute - potential error
+                # Determine certainty level based on context
+                # Determine category based on message type and symbol
+                if message_type == 'error' or symbol in DEFINITE_ERROR_SYMBOLS:
+                    category = self.RUNTIME_ERROR
+                elif symbol in POTENTIAL_ERROR_SYMBOLS:
+                    # Check context to see if this might be intentional
+                    # For example, if a variable is used in multiple places, it's less likely to be a typo
+                    if symbol == 'undefined-variable':
+                        var_name = message.split("'")
+                        if len(var_name) > 1 and var_name[1] in self.variables:
                             category = self.POTENTIAL_ERROR
-                            break
-                        elif isinstance(stmt, ast.Return):
-                            # Return statement that will never execute - runtime error
+                        else:
                             category = self.RUNTIME_ERROR
-                            break
-                    
+                    else:
+                        category = self.POTENTIAL_ERROR
+                else:
+                    category = self.BAD_HABIT
+                
+                if message_type == 'error' or symbol in DEFINITE_ERROR_SYMBOLS or symbol in POTENTIAL_ERROR_SYMBOLS:
                     self.feedback.append({
-                        'line': unreachable_line,
-                        'message': 'Unreachable code detected after return, break, or continue statement. This code will never execute.',
+                        'line': line,
+                        'message': message,
                         'is_bad_habit': True,
                         'category': category,
-                        'source': 'ast'
+                        'source': 'pylint'
                     })
+        except json.JSONDecodeError:
+            self.feedback.append({
+                'line': 0,
+                'message': 'Failed to parse pylint output',
+                'is_bad_habit': False,
+                'category': self.RUNTIME_ERROR,
+                'source': 'system'
+            })
+        except FuturesTimeoutError:
+            # Nobody will read this report now; drop it if it hasn't started
+            pylint_job.cancel()
+            self.feedback.append({
+                'line': 0,
+                'message': f'pylint did not finish within {PYLINT_TIMEOUT} seconds',
+                'is_bad_habit': False,
+                'category': self.RUNTIME_ERROR,
+                'source': 'system'
+            })
+        except Exception as e:
+            # Other errors
+            self.feedback.append({
+                'line': 0,
+                'message': f'Error running pylint: {str(e)}',
+                'is_bad_habit': False,
+                'category': self.RUNTIME_ERROR,
+                'source': 'system'
+            })
     
-    def _check_shadowing_builtins(self, tree):
-        """Check for variable names that shadow Python built-ins with context awareness."""
-        builtin_names = ['list', 'dict', 'set', 'tuple', 'int', 'float', 'str', 'bool', 'type',
-                         'object', 'file', 'open', 'input', 'print', 'range', 'enumerate',
-                         'len', 'max', 'min', 'sum', 'filter', 'map', 'zip']
+    def analyze_tree(self, tree, code):
+        """Run all analysis methods on code the caller has already parsed into tree."""
+        self._reset()
         
-        # Track usage of shadowed builtins
-        shadowed_builtins = {}
+        # Start pylint in the background; its report is only read once the
+        # AST checks below are done, since categorizing it uses their context.
+        # Empty code and lone literals give pylint nothing to report.
+        pylint_job = None if is_literal_only(tree) else start_pylint(code, tree)
         
-        # First pass: collect all shadowing instances
-        for node in ast.walk(tree):
-            # Check assignments
-            if isinstance(node, ast.Assign):
-                for target in node.targets:
-                    if isinstance(target, ast.Name) and target.id in builtin_names:
-                        if target.id not in shadowed_builtins:
-                            shadowed_builtins[target.id] = []
-                        shadowed_builtins[target.id].append({
-                            'node': node,
-                            'type': 'variable',
-                            'uses': 0
-                        })
-            
-            # Check function parameters
-            elif isinstance(node, ast.FunctionDef):
-                for arg in node.args.args:
-                    if arg.arg in builtin_names:
-                        if arg.arg not in shadowed_builtins:
-                            shadowed_builtins[arg.arg] = []
-                        shadowed_builtins[arg.arg].append({
-                            'node': node,
-                            'type': 'parameter',
-                            'uses': 0
-                        })
+        # Build context (variables, functions, control flow) and run the AST
+        # checks in a single walk over the tree
+        self._run_ast_analysis(tree)
         
-        # Second pass: check for usage of shadowed builtins
-        for builtin_name, instances in shadowed_builtins.items():
-            for instance in instances:
-                node = instance['node']
-                
-                # Default to bad habit - shadowing is usually just a style issue
-                category = self.BAD_HABIT
-                
-                # Check if the original builtin is used after shadowing, which would cause bugs
-                tries_to_use_original = False
-                scope_node = node
-                if instance['type'] == 'parameter':
-                    scope_node = node  # The function itself is the scope
-                
-                for subnode in ast.walk(scope_node):
-                    if isinstance(subnode, ast.Call) and isinstance(subnode.func, ast.Name) and subnode.func.id == builtin_name:
-                        tries_to_use_original = True
-                        break
-                
-                # If trying to use the original after shadowing, it's a runtime error
-                if tries_to_use_original:
-                    category = self.RUNTIME_ERROR
-                # If shadowing critical builtins like 'open', 'print', it's a potential error
-                elif builtin_name in ['open', 'print', 'input', 'len', 'str', 'int', 'float']:
-                    category = self.POTENTIAL_ERROR
-                
-                if instance['type'] == 'variable':
-                    self.feedback.append({
-                        'line': node.lineno,
-                        'message': f'Variable name "{builtin_name}" shadows a Python built-in. This will prevent you from using the original built-in function in this scope.',
-                        'is_bad_habit': True,
-                        'category': category,
-                        'source': 'ast'
-                    })
-                else:  # parameter
-                    self.feedback.append({
-                        'line': node.lineno,
-                        'message': f'Function parameter "{builtin_name}" shadows a Python built-in. This will prevent you from using the original built-in function inside this function.',
-                        'is_bad_habit': True,
-                        'category': category,
-                        'source': 'ast'
-                    })
+        # Collect the pylint analysis but filter for only serious issues
+        self._run_pylint_analysis(pylint_job)
+        
+        return self.feedback
+    
+    def _reset(self):
+        """Clear the state left over from the previous analysis."""
+        self.feedback = []
+        self.context = {}
+        self.variables = {}
+        self.functions = {}
+        self.control_flow = []
+    
+    def _run_ast_analysis(self, tree):
+        """Analyze the parsed code using Python's AST module for critical runtime issues with context awareness."""
+        # The checks themselves live in ast_visitor, which can be compiled
+        state = run_ast_analysis(tree)
+        self.feedback.extend(state.feedback)
+        self.variables = state.variables
+        self.functions = state.functions
+        self.control_flow = state.control_flow
 
-def generate_explanation(issue, code_lines=None):
-    """Generate a user-friendly explanation and fix for an issue using Claude."""
-    if not anthropicClient:
-        print("Anthropic client not available. Cannot generate explanation.")
-        return {
-            "explanation": "AI explanations unavailable. Please set up the Anthropic API key.",
-            "fix": None
-        }
+# analyze() keeps its working state on the instance, so rather than sharing a
+# single analyzer (and serializing every request behind a lock) each thread
+# builds one the first time it needs it and reuses it afterwards.
+_analyzer_local = threading.local()
+
+def get_analyzer():
+    """Return the current thread's PythonHabitAnalyzer, creating it on first use."""
+    analyzer = getattr(_analyzer_local, 'analyzer', None)
+    if analyzer is None:
+        analyzer = _analyzer_local.analyzer = PythonHabitAnalyzer()
+    return analyzer
+
+# Analysis results are also kept on disk, so they survive worker restarts and
+# are shared between the workers on a machine. The in-memory LRU cache below
+# sits in front of it. Bump ANALYSIS_CACHE_VERSION whenever a change to the
+# analyzer changes its output, so stale results are not served.
+ANALYSIS_CACHE_VERSION = 4
+# diskcache unpickles what it reads, so the cache directory must be private
+# to this user. The default one is per user, and on POSIX a directory owned by
+# someone else or writable by others is refused.
+CACHE_UID = os.getuid() if hasattr(os, 'getuid') else None
+ANALYSIS_CACHE_DIR = os.environ.get('ANALYSIS_CACHE_DIR') or (
+    os.path.join(tempfile.gettempdir(), 'python-help-analysis' if CACHE_UID is None else f'python-help-analysis-{CACHE_UID}')
+)
+
+def open_analysis_disk_cache(path):
+    """Open the analysis disk cache at path, or return None if it is unavailable or not private to this user."""
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        if CACHE_UID is not None:
+            info = os.lstat(path)
+            if not stat.S_ISDIR(info.st_mode) or info.st_uid != CACHE_UID or info.st_mode & 0o022:
+                logger.warning("Analysis disk cache disabled: %s is not a directory writable only by this user", path)
+                return None
+        return Cache(path, size_limit=100_000_000)
+    except Exception as e:
+        logger.warning("Analysis disk cache unavailable at %s: %s", path, e)
+        return None
+
+analysis_disk_cache = open_analysis_disk_cache(ANALYSIS_CACHE_DIR) if Cache is not None else None
+
+def _analysis_disk_key(code):
+    """Return the disk cache key for a piece of code."""
+    digest = hashlib.blake2b(code.encode('utf-8'), digest_size=16).hexdigest()
+    return f'{ANALYSIS_CACHE_VERSION}:{digest}'
+
+class UncacheableFeedback(Exception):
+    """Carries feedback out of _analyze_cached without caching it, since lru_cache doesn't cache exceptions."""
+    
+    def __init__(self, feedback):
+        super().__init__()
+        self.feedback = feedback
+
+@lru_cache(maxsize=256)
+def _analyze_cached(code):
+    """Run the analyzer on a piece of code, caching the resulting feedback.
+    
+    The frontend resubmits unchanged code every time the user clicks
+    analyze, and the analysis (AST checks plus a pylint run) only depends on
+    the code itself, so repeat submissions skip it entirely.
+    """
+    if not code.strip():
+        # Nothing to analyze, and not worth a cache entry either
+        return []
     
+    disk_key = None
+    if analysis_disk_cache is not None:
+        disk_key = _analysis_disk_key(code)
+        try:
+            feedback = analysis_disk_cache.get(disk_key)
+        except Exception as e:
+            logger.warning("Error reading the analysis disk cache: %s", e)
+            feedback = None
+        if feedback is not None:
+            return feedback
+    
+    # Parse once: the syntax check, the analyzer and its fallback all share the tree
     try:
-        # Extract relevant information from the issue
-        category = issue.get('category', 'unknown')
-        message = issue.get('message', '')
-        line_num = issue.get('line', 0)
-        
-        print(f"Generating explanation for issue: {category} - {message} at line {line_num}")
-        
-        # Get the relevant code snippet if code_lines is provided
-        code_context = ""
-        if code_lines and line_num > 0:
-            # Get a few lines before and after the issue line for context
-            start_line = max(0, line_num - 3)
-            end_line = min(len(code_lines), line_num + 3)
-            for i in range(start_line, end_line):
-                if i < len(code_lines):
-                    line_marker = "-->" if i + 1 == issue['line'] else "   "
-                    code_context += f"{line_marker} {i+1}: {code_lines[i]}\n"
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        feedback = ({
+            'line': e.lineno,
+            'message': f'SyntaxError: {e.msg}',
+            'category': PythonHabitAnalyzer.SYNTAX_ERROR,
+            'source': 'analyzer'
+        },)
+    else:
+        try:
+            feedback = tuple(get_analyzer().analyze_tree(tree, code))
+        except Exception as e:
+            logger.error("Error using main analyzer: %s", e)
+            # If the main analyzer fails, use the fallback checks. Their
+            # results are not written to disk, so a fixed analyzer takes over
+            # again after a restart.
+            try:
+                return tuple(HabitVisitor().analyze(tree))
+            except Exception as ast_error:
+                logger.error("Error in AST analysis: %s", ast_error)
+                raise UncacheableFeedback(({
+                    'line': 1,
+                    'message': f'Error analyzing code: {str(ast_error)}',
+                    'category': PythonHabitAnalyzer.RUNTIME_ERROR,
+                    'source': 'system'
+                },))
+    
+    # System items report failures (e.g. a pylint run that errored or timed
+    # out) rather than anything about the code, so the next submission of
+    # the same code gets a fresh analysis
+    if any(item.get('source') == 'system' for item in feedback):
+        raise UncacheableFeedback(feedback)
+    
+    if disk_key is not None:
+        try:
+            analysis_disk_cache.set(disk_key, feedback)
+        except Exception as e:
+            logger.warning("Error writing the analysis disk cache: %s", e)
+    return feedback
+
+def analyze_code(code):
+    """Return the analyzer's feedback for the code as a fresh list of issue dicts."""
+    try:
+        feedback = _analyze_cached(code)
+    except UncacheableFeedback as e:
+        feedback = e.feedback
+    # Copy the cached items since callers attach explanations to them
+    return [dict(item) for item in feedback]
+
+# Names the fallback analyzer never reports as undefined: every real builtin,
+# plus the common ones listed explicitly
+BUILTIN_NAMES = frozenset(dir(builtins)) | {'print', 'len', 'range', 'str', 'int', 'float', 'list', 'dict', 'set', 'tuple', 'sum', 'min', 'max', 'open', 'type'}
+
+class HabitVisitor(ast.NodeVisitor):
+    """Fallback checks used when PythonHabitAnalyzer fails, run in one traversal of the tree."""
+    
+    def __init__(self):
+        self.feedback = []
+        self.defined_vars = set()
+        self.defined_functions = set()
+    
+    def analyze(self, tree):
+        """Run all fallback checks on a parsed module and return the feedback."""
+        # Top-level functions and variables can be referenced before their
+        # definition (e.g. from inside an earlier function), so collect them
+        # up front. Everything else is recorded as the visitor reaches it.
+        for node in ast.iter_child_nodes(tree):
+            if isinstance(node, ast.FunctionDef):
+                self.defined_functions.add(node.name)
+            elif isinstance(node, ast.Assign):
+                self._record_targets(node)
         
-        # Prepare the prompt for Claude
-        category = issue.get('category', 'error')
-        message = issue.get('message', 'Unknown error')
+        self.visit(tree)
+        return self.feedback
+    
+    def visit(self, node):
+        # Look the handler up by node type instead of NodeVisitor's per-node
+        # 'visit_' + class name string building and getattr
+        handler = self.HANDLERS.get(type(node))
+        if handler is None:
+            self.generic_visit(node)
+        else:
+            handler(self, node)
+    
+    def _record_targets(self, node):
+        for target in node.targets:
+            if isinstance(target, ast.Name):
+                self.defined_vars.add(target.id)
+    
+    def visit_Assign(self, node):
+        self._record_targets(node)
+        self.generic_visit(node)
+    
+    def visit_FunctionDef(self, node):
+        self.defined_functions.add(node.name)
         
-        prompt = f"""You are a Python expert helping a programmer understand and fix an issue in their code.
+        # Check for mutable default arguments
+        for default in node.args.defaults:
+            if isinstance(default, (ast.List, ast.Dict, ast.Set)):
+                self.feedback.append({
+                    'line': node.lineno,
+                    'message': f'Using mutable default argument in function \'{node.name}\'',
+                    'category': 'potential_error',
+                    'source': 'analyzer'
+                })
+        self.generic_visit(node)
+    
+    def visit_Name(self, node):
+        # Check for undefined variables
+        if isinstance(node.ctx, ast.Load):
+            var_name = node.id
+            # Skip built-ins and common functions
+            if var_name not in self.defined_vars and var_name not in self.defined_functions and var_name not in BUILTIN_NAMES and not var_name.startswith('__'):
+                self.feedback.append({
+                    'line': node.lineno,
+                    'message': f'Undefined variable \'{var_name}\'',
+                    'category': 'runtime_error',
+                    'source': 'analyzer'
+                })
+    
+    def visit_Attribute(self, node):
+        # Check for attribute errors
+        if isinstance(node.value, ast.Name):
+            obj_name = node.value.id
+            attr_name = node.attr
+            # If we can't find the object in defined vars, it might be an attribute error
+            if obj_name not in self.defined_vars and obj_name not in BUILTIN_NAMES:
+                self.feedback.append({
+                    'line': node.lineno,
+                    'message': f'Instance of \'{obj_name}\' has no \'{attr_name}\' member',
+                    'category': 'runtime_error',
+                    'source': 'analyzer'
+                })
+        self.generic_visit(node)
+    
+    def visit_While(self, node):
+        # Check for potential infinite loops
+        if isinstance(node.test, ast.Constant) and node.test.value == True:
+            self.feedback.append({
+                'line': node.lineno,
+                'message': 'Infinite loop detected',
+                'category': 'fatal_error',
+                'source': 'analyzer'
+            })
+        self.generic_visit(node)
+    
+    def visit_ExceptHandler(self, node):
+        # Check for catching all exceptions
+        if node.type is None:
+            self.feedback.append({
+                'line': node.lineno,
+                'message': 'Catching all exceptions (bare except) is a bad practice',
+                'category': 'bad_habit',
+                'source': 'analyzer'
+            })
+        self.generic_visit(node)
+    
+    # Node types with a check; register a handler here to add one
+    HANDLERS = {
+        ast.Assign: visit_Assign,
+        ast.FunctionDef: visit_FunctionDef,
+        ast.Name: visit_Name,
+        ast.Attribute: visit_Attribute,
+        ast.While: visit_While,
+        ast.ExceptHandler: visit_ExceptHandler,
+    }
 
-Issue Type: {category}
-Issue Message: {message}
+# The system prompt and response instructions are identical for every issue.
+# They lead each request and are marked for prompt caching, so only the
+# issue-specific details that follow them are billed at the full input rate.
+EXPLANATION_SYSTEM_PROMPT = "You are a helpful Python expert. Provide clear, concise explanations and fixes for Python code issues."
 
-"""
+EXPLANATION_INSTRUCTIONS = """You are a Python expert helping a programmer understand and fix an issue in their code.
+
+For the issue described below, please provide:
+1. A very brief explanation (1-2 sentences max) of what this issue means in simple terms
+2. A direct, specific code fix with EXACT code examples showing:
+   - The problematic code (labeled 'BEFORE:') with line numbers - USE THE EXACT CODE SHOWN BELOW
+   - The fixed code (labeled 'AFTER:') with line numbers - MODIFY ONLY WHAT NEEDS TO BE CHANGED
+   - Show the EXACT code to replace, not just a description
+   - Use the same variable names and structure as in the original code
 
-        if code_context:
-            prompt += f"""Code Context (the problematic line is marked with '-->'):  
+Format your response exactly like this:
+Explanation: [1-2 sentence explanation]
+
+Fix:
+BEFORE:
 ```python
-{code_context}
+# Exact problematic code with line numbers
 ```
 
+AFTER:
+```python
+# Exact fixed code with line numbers
+```
 """
-        
-        prompt += """Please provide:
-1. A clear explanation of what's causing this issue in plain language that's easy to understand.
-2. A specific fix for the code.
 
-Format your response exactly like this:
-Explanation: [Your explanation here]
+# Pulls the explanation and (optional) fix sections out of a response in one pass
+_RESPONSE_RE = re.compile(r'Explanation:\s*(?P<explanation>.*?)(?:\s*Fix:\s*(?P<fix>.*))?\Z', re.DOTALL)
+
+# Canned explanations for issues that always mean the same thing, keyed by a
+# fragment of the issue message. These are answered without calling Claude.
+STATIC_EXPLANATIONS = {
+    'Catching all exceptions': (
+        "A bare except (or except Exception) catches every error, including ones you didn't expect, "
+        "so real bugs get silently swallowed and become very hard to track down.",
+        "BEFORE:\n```python\ntry:\n    value = int(text)\nexcept:\n    pass\n```\n\n"
+        "AFTER:\n```python\ntry:\n    value = int(text)\nexcept ValueError as e:\n"
+        "    print(f\"Could not convert {text!r}: {e}\")\n```"
+    ),
+    'mutable default argument': (
+        "Default values are created once when the function is defined, so a list, dict or set default "
+        "is shared between every call and changes made in one call leak into the next.",
+        "BEFORE:\n```python\ndef add_item(item, items=[]):\n    items.append(item)\n    return items\n```\n\n"
+        "AFTER:\n```python\ndef add_item(item, items=None):\n    if items is None:\n        items = []\n"
+        "    items.append(item)\n    return items\n```"
+    ),
+    'Infinite loop detected': (
+        "A while True loop with no break, return or raise inside it never ends, "
+        "so your program will hang at this point.",
+        "BEFORE:\n```python\nwhile True:\n    line = read_line()\n    process(line)\n```\n\n"
+        "AFTER:\n```python\nwhile True:\n    line = read_line()\n    if not line:\n        break\n"
+        "    process(line)\n```"
+    ),
+    'File opened without using a context manager': (
+        "A file opened without a with statement is only closed if you remember to call close(), "
+        "and never if an exception happens first, which leaks file handles.",
+        "BEFORE:\n```python\nf = open(\"data.txt\")\ncontent = f.read()\nf.close()\n```\n\n"
+        "AFTER:\n```python\nwith open(\"data.txt\") as f:\n    content = f.read()\n```"
+    ),
+    'Unreachable code detected': (
+        "Statements after a return, break or continue in the same block can never run, "
+        "so whatever they were meant to do silently never happens.",
+        "BEFORE:\n```python\ndef total(values):\n    return sum(values)\n    print(\"done\")\n```\n\n"
+        "AFTER:\n```python\ndef total(values):\n    print(\"done\")\n    return sum(values)\n```"
+    ),
+}
+
+# Canned explanations that mention a name from the issue message, keyed by a
+# pattern whose named groups are filled into the text
+STATIC_EXPLANATION_TEMPLATES = {
+    re.compile(r'Variable name "(?P<name>\w+)" shadows a Python built-in'): (
+        "Assigning to {name} hides Python's built-in {name} for the rest of this scope, "
+        "so any later use of the built-in here gets your value instead and fails or misbehaves.",
+        "BEFORE:\n```python\n{name} = get_data()\n```\n\n"
+        "AFTER:\n```python\n{name}_value = get_data()\n```"
+    ),
+    re.compile(r'Function parameter "(?P<name>\w+)" shadows a Python built-in'): (
+        "Naming a parameter {name} hides Python's built-in {name} inside the function, "
+        "so any use of the built-in in its body gets the argument instead.",
+        "BEFORE:\n```python\ndef process({name}):\n    return handle({name})\n```\n\n"
+        "AFTER:\n```python\ndef process({name}_value):\n    return handle({name}_value)\n```"
+    ),
+}
+
+def static_explanation(message):
+    """Return the canned (explanation, fix) for an issue message, or None if it needs Claude."""
+    for fragment, explanation_and_fix in STATIC_EXPLANATIONS.items():
+        if fragment in message:
+            return explanation_and_fix
+    for pattern, (explanation, fix) in STATIC_EXPLANATION_TEMPLATES.items():
+        match = pattern.search(message)
+        if match:
+            return explanation.format(**match.groupdict()), fix.format(**match.groupdict())
+    return None
+
+def apply_static_explanations(issues):
+    """Fill in canned explanations where one matches, returning the issues that still need Claude."""
+    remaining = []
+    for issue in issues:
+        explanation_and_fix = static_explanation(issue.get('message', ''))
+        if explanation_and_fix:
+            issue['explanation'], issue['fix'] = explanation_and_fix
+        else:
+            remaining.append(issue)
+    return remaining
 
-Fix: [Your suggested fix here, with code examples if applicable]
+# Every character of context is billed as input tokens on every explanation,
+# so very long lines (minified code, huge literals) are cut down before they
+# are sent. 800 characters is roughly 200 tokens.
+MAX_CONTEXT_LINE_CHARS = 200
+MAX_CONTEXT_CHARS = 800
+
+def get_code_context(issue, code_lines=None):
+    """Return the lines around an issue, with the problematic line marked with '-->'."""
+    line_num = issue.get('line', 0)
+    
+    # Get the relevant code snippet if code_lines is provided
+    if not code_lines or line_num <= 0:
+        return ""
+    
+    # Get a few lines before and after the issue line for context
+    start_line = max(0, line_num - 3)
+    code_context = "".join(
+        f"{'-->' if i + 1 == line_num else '   '} {i+1}: {line[:MAX_CONTEXT_LINE_CHARS]}\n"
+        for i, line in enumerate(code_lines[start_line:line_num + 3], start=start_line)
+    )
+    return code_context[:MAX_CONTEXT_CHARS]
+
+def explanation_inputs(issue, code_lines=None):
+    """Return the (category, message, code_context) an issue's explanation depends on."""
+    return (
+        issue.get('category', 'error'),
+        issue.get('message', 'Unknown error'),
+        get_code_context(issue, code_lines)
+    )
+
+# Issue-specific part of the prompt. Only the placeholders change between
+# calls, so the templates are built once rather than per explanation.
+_PROMPT_TEMPLATE = """Issue Type: {category}
+Issue Message: {message}
+"""
+
+_PROMPT_WITH_CONTEXT_TEMPLATE = _PROMPT_TEMPLATE + """
+Code Context (the problematic line is marked with '-->'):  
+```python
+{code_context}
+```
 """
 
+def build_explanation_prompt(category, message, code_context):
+    """Build the issue-specific part of the Claude prompt for an explanation and fix."""
+    template = _PROMPT_WITH_CONTEXT_TEMPLATE if code_context else _PROMPT_TEMPLATE
+    return template.format(category=category, message=message, code_context=code_context)
+
+def build_explanation_request(category, message, code_context):
+    """Build the messages.create parameters for explaining an issue."""
+    return {
+        "model": "claude-3-haiku-20240307",
+        "max_tokens": 300,
+        "temperature": 0,
+        "system": [
+            {"type": "text", "text": EXPLANATION_SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}
+        ],
+        "messages": [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": EXPLANATION_INSTRUCTIONS, "cache_control": {"type": "ephemeral"}},
+                    {"type": "text", "text": build_explanation_prompt(category, message, code_context)}
+                ]
+            }
+        ]
+    }
+
+def parse_explanation_response(response_text):
+    """Split a Claude response into its explanation and fix sections."""
+    match = _RESPONSE_RE.search(response_text)
+    if match:
+        explanation = match.group('explanation').strip()
+        fix = match.group('fix')
+        if fix:
+            fix = fix.strip()
+        else:
+            fix = None
+            logger.warning("No 'Fix:' section found in Claude response")
+    else:
+        explanation = "Claude did not return an explanation in the expected format."
+        fix = None
+        logger.warning("Failed to parse explanation from Claude response: %s", response_text)
+    
+    return {
+        "explanation": explanation,
+        "fix": fix
+    }
+
+def _find_fix_end(response_text):
+    """Return the index just past the closing fence of the AFTER: code block, or -1 if it isn't there yet."""
+    after_start = response_text.find('AFTER:')
+    if after_start == -1:
+        return -1
+    block_start = response_text.find('```', after_start)
+    if block_start == -1:
+        return -1
+    block_end = response_text.find('```', block_start + 3)
+    return -1 if block_end == -1 else block_end + 3
+
+@lru_cache(maxsize=1024)
+def _explain_cached(category, message, code_context):
+    """Ask Claude to explain an issue and return an (explanation, fix) tuple.
+    
+    Users resubmit the same code while iterating on it, so repeated issues are
+    answered from memory instead of another API round trip. The key includes
+    the code context, not just the category and message, because the fix is
+    written against that code and would be wrong for the same message on
+    another line. API errors are raised rather than returned so that
+    failures never get cached.
+    """
+    # Stream the response so generation can be cut off as soon as the fix is complete
+    response_text = ""
+    with anthropicClient.messages.stream(
+        **build_explanation_request(category, message, code_context)
+    ) as stream:
+        for text in stream.text_stream:
+            response_text += text
+            # Anything after the AFTER: code block would be thrown away by the
+            # parser below, so stop waiting for (and paying for) those tokens
+            if '`' in text:
+                fix_end = _find_fix_end(response_text)
+                if fix_end != -1:
+                    response_text = response_text[:fix_end]
+                    stream.close()
+                    break
+    
+    logger.debug("Claude response received: %d chars", len(response_text))
+    
+    # Parse the response to extract explanation and fix
+    explanation_data = parse_explanation_response(response_text)
+    return explanation_data['explanation'], explanation_data['fix']
+
+def generate_explanation(issue, code_lines=None):
+    """Generate a user-friendly explanation and fix for an issue using Claude."""
+    if not anthropicClient:
+        logger.warning("Anthropic client not available. Cannot generate explanation.")
+        return {
+            "explanation": "AI explanations unavailable. Please set up the Anthropic API key.",
+            "fix": None
+        }
+    
+    try:
+        # Extract relevant information from the issue
+        category = issue.get('category', 'unknown')
+        message = issue.get('message', '')
+        line_num = issue.get('line', 0)
+        
+        logger.debug("Generating explanation for issue: %s - %s at line %s", category, message, line_num)
+        
+        # Call Claude API (or reuse an earlier answer for the same issue).
+        # The SDK already retries connection errors, 429s and 5xx responses
+        # with exponential backoff.
         try:
-            # Call Claude API with timeout and retry logic
-            max_retries = 2
-            retry_count = 0
-            last_error = None
-            
-            while retry_count <= max_retries:
-                try:
-                    # Call Claude API
-                    response = anthropicClient.messages.create(
-                        model="claude-3-haiku-20240307",
-                        max_tokens=1000,
-                        messages=[
-                            {"role": "user", "content": prompt}
-                        ]
-                    )
-                    
-                    # Extract the response text
-                    response_text = response.content[0].text
-                    print(f"Claude response received: {len(response_text)} chars")
-                    
-                    # Parse the response to extract explanation and fix
-                    if "Explanation:" in response_text:
-                        # Split by "Explanation:" and then by "Fix:"
-                        explanation_parts = response_text.split("Explanation:", 1)
-                        if len(explanation_parts) > 1:
-                            explanation_text = explanation_parts[1]
-                        else:
-                            explanation_text = response_text
-                        
-                        # Split to get the fix part
-                        fix_parts = explanation_text.split('Fix:', 1)
-                        explanation = fix_parts[0].strip()
-                        
-                        if len(fix_parts) > 1:
-                            fix = fix_parts[1].strip()
-                        else:
-                            fix = None
-                            print("No 'Fix:' section found in Claude response")
-                    else:
-                        explanation = "Claude did not return an explanation in the expected format."
-                        fix = None
-                        print(f"Failed to parse explanation from Claude response: {response_text}")
-                    
-                    return {
-                        "explanation": explanation,
-                        "fix": fix
-                    }
-                    
-                except Exception as retry_error:
-                    last_error = retry_error
-                    print(f"API call attempt {retry_count + 1} failed: {str(retry_error)}")
-                    retry_count += 1
-                    # Wait a bit before retrying (exponential backoff)
-                    import time
-                    time.sleep(1 * retry_count)
-            
-            # If we get here, all retries failed
-            error_message = f"Error calling Claude API after {max_retries + 1} attempts: {str(last_error)}"
-            print(error_message)
+            explanation, fix = _explain_cached(*explanation_inputs(issue, code_lines))
             return {
-                "explanation": error_message,
-                "fix": None
+                "explanation": explanation,
+                "fix": fix
             }
             
         except Exception as api_error:
-            print(f"Error calling Claude API: {str(api_error)}")
+            logger.error("Error calling Claude API: %s", api_error)
             return {
-                "explanation": f"Failed to generate explanation: {str(api_error)}",
+                "explanation": f"Error calling Claude API: {str(api_error)}",
                 "fix": None
             }
             
     except Exception as e:
-        print(f"Error in generate_explanation: {str(e)}")
+        logger.error("Error in generate_explanation: %s", e)
         return {
             "explanation": f"Failed to generate explanation: {str(e)}",
             "fix": None
         }
 
+def iter_explanations(issues, code_lines):
+    """Dispatch Claude calls for the issues concurrently and yield (issue, explanation_data) pairs as they finish."""
+    # Dispatch all Claude calls at once so the total wait is the slowest call,
+    # not the sum. Identical issues (same category, message and code context)
+    # share a call: sent together, they would all miss the explanation cache.
+    futures_by_inputs = {}
+    issues_by_future = {}
+    for issue in issues:
+        inputs = explanation_inputs(issue, code_lines)
+        future = futures_by_inputs.get(inputs)
+        if future is None:
+            future = futures_by_inputs[inputs] = explanation_executor.submit(generate_explanation, issue, code_lines)
+            issues_by_future[future] = []
+        issues_by_future[future].append(issue)
+    
+    # Don't let one slow call hold up the whole response. Calls that are
+    # already running still finish and land in the explanation cache, so
+    # analyzing again picks them up.
+    try:
+        for future in as_completed(list(issues_by_future), timeout=EXPLANATION_TIMEOUT):
+            explanation_data = future.result()
+            for issue in issues_by_future.pop(future):
+                yield issue, explanation_data
+    except FuturesTimeoutError:
+        logger.warning("%d of %d explanations timed out", len(issues_by_future), len(futures_by_inputs))
+        timed_out = {
+            "explanation": "Timed out waiting for an explanation. Analyze again to retry.",
+            "fix": None
+        }
+        for future, waiting_issues in issues_by_future.items():
+            future.cancel()
+            for issue in waiting_issues:
+                yield issue, timed_out
+
+def explain_issues(issues, code_lines):
+    """Attach Claude explanations and fixes to each issue, dispatching the calls concurrently."""
+    for issue, explanation_data in iter_explanations(issues, code_lines):
+        issue['explanation'] = explanation_data['explanation']
+        issue['fix'] = explanation_data['fix']
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Explanation added: %s...", issue['explanation'][:50])
+
+def stream_analysis(feedback, issues, code_lines):
+    """Yield an NDJSON analysis: the sorted feedback first, then each explanation as it arrives.
+    
+    Explanation lines look like {"index": ..., "explanation": ..., "fix": ...},
+    where index is the issue's position in the feedback list, and the stream
+    ends with {"done": true}.
+    """
+    yield app.json.dumps({'feedback': feedback}) + '\n'
+    
+    positions = {id(item): index for index, item in enumerate(feedback)}
+    try:
+        for issue, explanation_data in iter_explanations(issues, code_lines):
+            yield app.json.dumps({'index': positions[id(issue)], **explanation_data}) + '\n'
+    except Exception as explain_error:
+        logger.error("Error generating explanations: %s", explain_error)
+        yield app.json.dumps({'error': f'Error generating explanations: {str(explain_error)}'}) + '\n'
+    
+    yield app.json.dumps({'done': True}) + '\n'
+
+# Severity order used to sort feedback; unknown categories go last
+CATEGORY_PRIORITY = {
+    PythonHabitAnalyzer.SYNTAX_ERROR: 0,
+    PythonHabitAnalyzer.FATAL_ERROR: 1,
+    PythonHabitAnalyzer.RUNTIME_ERROR: 2,
+    PythonHabitAnalyzer.POTENTIAL_ERROR: 3,
+    PythonHabitAnalyzer.BAD_HABIT: 4
+}
+
+_by_sortkey = itemgetter('_sortkey')
+
+def sort_feedback(feedback):
+    """Order feedback items by severity, then line."""
+    # Every analyzer and route builds its items with a category already;
+    # the check is compiled out under python -O
+    assert all('category' in item for item in feedback), feedback
+    
+    for item in feedback:
+        item['_sortkey'] = (CATEGORY_PRIORITY.get(item['category'], 999), item['line'])
+    
+    # Sort feedback by category priority and line number
+    feedback.sort(key=_by_sortkey)
+    for item in feedback:
+        del item['_sortkey']
+
 @app.route('/')
 def index():
     """Render the main page."""
     return render_template('index.html')
 
 
+@app.route('/healthz')
+def healthz():
+    """Report liveness without touching the Claude API."""
+    return jsonify({'status': 'ok', 'ai_explanations': anthropicClient is not None})
+
+
+# Largest submission, in characters, that is analyzed at all. Anything bigger
+# would tie up a worker and could run up a large Claude bill.
+MAX_CODE_SIZE = 200_000
+
+def code_too_large_response(code):
+    """Return the 413 response for a submission over MAX_CODE_SIZE."""
+    message = f'Code is too large to analyze ({len(code)} characters, the limit is {MAX_CODE_SIZE}).'
+    return jsonify({
+        'error': message,
+        'feedback': [{
+            'line': 0,
+            'message': message,
+            'category': PythonHabitAnalyzer.SYNTAX_ERROR,
+            'source': 'system'
+        }]
+    }), 413
+
+def server_error_response(error):
+    """Return the 500 response for an unexpected error while handling an analysis request."""
+    return jsonify({
+        'error': str(error),
+        'feedback': [{
+            'line': 0,
+            'message': f'Server error: {str(error)}',
+            'category': PythonHabitAnalyzer.SYNTAX_ERROR,
+            'source': 'system'
+        }]
+    }), 500
+
 @app.route('/analyze', methods=['POST'])
 def analyze():
     """Analyze the submitted Python code for runtime issues with context awareness."""
-    data = request.get_json()
-    code = data.get('code', '')
-    
-    # Split code into lines for context in explanations
-    code_lines = code.split('\n')
-    
-    analyzer = PythonHabitAnalyzer()
-    feedback = analyzer.analyze(code)
-    
-    print(f"Found {len(feedback)} issues to analyze")
-    
-    # Generate explanations for each issue if AI is available
-    if anthropicClient:
-        print("Anthropic client is available, generating explanations...")
-        for i, issue in enumerate(feedback):
-            # Only generate explanations for actual issues (not system messages)
-            if issue.get('source') != 'system':
-                print(f"Generating explanation for issue {i+1}/{len(feedback)}")
-                explanation_data = generate_explanation(issue, code_lines)
-                issue['explanation'] = explanation_data['explanation']
-                issue['fix'] = explanation_data['fix']
-                print(f"Explanation added: {issue['explanation'][:50]}...")
-            else:
-                print(f"Skipping system message: {issue.get('message', '')}")
-    else:
-        print("Anthropic client is not available, skipping explanations")
-    
-    # Ensure all feedback items have a category
-    for item in feedback:
-        # Convert old certainty levels to new categories if needed
-        if 'certainty' in item and 'category' not in item:
-            if item['certainty'] == 'error':
-                if 'SyntaxError' in item['message']:
-                    item['category'] = analyzer.SYNTAX_ERROR
-                elif any(fatal in item['message'] for fatal in ['division by zero', 'index out of range', 'key error']):
-                    item['category'] = analyzer.FATAL_ERROR
-                else:
-                    item['category'] = analyzer.RUNTIME_ERROR
-            elif item['certainty'] == 'might_error':
-                item['category'] = analyzer.POTENTIAL_ERROR
-            else:
-                item['category'] = analyzer.BAD_HABIT
-        elif 'category' not in item:
-            # Default to runtime error if no category specified
-            item['category'] = analyzer.RUNTIME_ERROR
+    try:
+        data = request.get_json()
+        code = data.get('code', '')
+        
+        # Nothing to analyze or explain
+        if not code.strip():
+            return jsonify({'feedback': []})
+        if len(code) > MAX_CODE_SIZE:
+            return code_too_large_response(code)
+        
+        # Split code into lines for context in explanations
+        code_lines = code.split('\n')
+        
+        feedback = analyze_code(code)
+        
+        logger.debug("Found %d issues to analyze", len(feedback))
+        
+        # Only generate explanations for actual issues (not system messages),
+        # and only ask Claude about the ones without a canned explanation
+        issues = apply_static_explanations([issue for issue in feedback if issue.get('source') != 'system'])
+        
+        # Clients that ask for NDJSON get the analysis right away and each
+        # explanation as soon as its Claude call returns
+        if request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson':
+            sort_feedback(feedback)
+            return Response(
+                stream_analysis(feedback, issues if anthropicClient else [], code_lines),
+                mimetype='application/x-ndjson'
+            )
+        
+        # Generate explanations for each issue if AI is available
+        if anthropicClient:
+            logger.debug("Generating explanations for %d issues", len(issues))
+            try:
+                explain_issues(issues, code_lines)
+            except Exception as explain_error:
+                logger.error("Error generating explanations: %s", explain_error)
+                feedback.append({
+                    'line': 0,
+                    'message': f'Error generating explanations: {str(explain_error)}',
+                    'category': PythonHabitAnalyzer.SYNTAX_ERROR,
+                    'source': 'system',
+                    'explanation': f'Failed to generate explanations: {str(explain_error)}',
+                    'fix': None
+                })
+        else:
+            logger.debug("Anthropic client is not available, skipping explanations")
+        
+        sort_feedback(feedback)
+        
+        return jsonify({'feedback': feedback})
+    except Exception as e:
+        return server_error_response(e)
+
+
+@app.route('/analyze/deep', methods=['POST'])
+def analyze_deep():
+    """Analyze the submitted code and queue its explanations as a single Message Batches job.
     
-    # Sort feedback by category priority and line number
-    category_priority = {
-        analyzer.SYNTAX_ERROR: 0,
-        analyzer.FATAL_ERROR: 1,
-        analyzer.RUNTIME_ERROR: 2,
-        analyzer.POTENTIAL_ERROR: 3,
-        analyzer.BAD_HABIT: 4
-    }
+    Batches are billed at half price but can take minutes to finish, so the
+    analysis is returned right away along with a job id the client polls at
+    /analyze/deep/<job_id>. Explanations are joined back onto the feedback
+    by each issue's 'id'.
+    """
+    try:
+        data = request.get_json()
+        code = data.get('code', '')
+        if not code.strip():
+            return jsonify({'status': 'ended', 'feedback': []})
+        if len(code) > MAX_CODE_SIZE:
+            return code_too_large_response(code)
+        code_lines = code.split('\n')
+        
+        feedback = analyze_code(code)
+        sort_feedback(feedback)
+        
+        # Only generate explanations for actual issues (not system messages),
+        # and only ask Claude about the ones without a canned explanation
+        issues = apply_static_explanations([issue for issue in feedback if issue.get('source') != 'system'])
+        
+        # Small analyses are answered faster by the regular synchronous path
+        if not anthropicClient or len(issues) < DEEP_ANALYSIS_BATCH_THRESHOLD:
+            if anthropicClient:
+                explain_issues(issues, code_lines)
+            return jsonify({'status': 'ended', 'feedback': feedback})
+        
+        batch_requests = []
+        for i, issue in enumerate(issues):
+            issue['id'] = f"issue-{i}"
+            batch_requests.append({
+                "custom_id": issue['id'],
+                "params": build_explanation_request(*explanation_inputs(issue, code_lines))
+            })
+        
+        try:
+            batch = anthropicClient.messages.batches.create(requests=batch_requests)
+        except Exception as e:
+            logger.error("Error creating explanation batch: %s", e)
+            return jsonify({
+                'error': str(e),
+                'feedback': feedback
+            }), 502
+        
+        logger.info("Queued %d explanations as batch %s", len(batch_requests), batch.id)
+        # The signed batch id is the job id: Anthropic keeps the batch and its
+        # results, so there is no job state to store on our side.
+        return jsonify({
+            'job_id': job_id_serializer.dumps(batch.id),
+            'status': batch.processing_status,
+            'feedback': feedback
+        }), 202
+    except Exception as e:
+        return server_error_response(e)
+
+
+@app.route('/analyze/deep/<job_id>', methods=['GET'])
+def analyze_deep_results(job_id):
+    """Return the explanations for a deep analysis job once its batch has finished."""
+    if not anthropicClient:
+        return jsonify({'error': 'AI explanations unavailable. Please set up the Anthropic API key.'}), 503
     
-    feedback.sort(key=lambda x: (category_priority.get(x['category'], 999), x['line']))
+    try:
+        batch_id = job_id_serializer.loads(job_id)
+    except BadSignature:
+        return jsonify({'error': 'Unknown job id'}), 404
     
-    return jsonify({'feedback': feedback})
-
+    try:
+        batch = anthropicClient.messages.batches.retrieve(batch_id)
+        if batch.processing_status != 'ended':
+            return jsonify({'job_id': job_id, 'status': batch.processing_status})
+        
+        explanations = {}
+        for entry in anthropicClient.messages.batches.results(batch_id):
+            if entry.result.type == 'succeeded':
+                explanations[entry.custom_id] = parse_explanation_response(entry.result.message.content[0].text)
+            else:
+                explanations[entry.custom_id] = {
+                    "explanation": f"Failed to generate explanation: batch request {entry.result.type}",
+                    "fix": None
+                }
+        
+        return jsonify({
+            'job_id': job_id,
+            'status': batch.processing_status,
+            'explanations': explanations
+        })
+    except Exception as e:
+        logger.error("Error retrieving explanation batch %s: %s", batch_id, e)
+        return jsonify({'error': str(e)}), 500
 
-# For local development
-if __name__ == '__main__':
-    app.run(debug=True)
 
-# For Vercel deployment
-# Make sure Flask app is properly exported
+# Vercel serves this app through api/index.py; ProxyFix makes request.url and
+# friends reflect the original client request behind its proxy
 from werkzeug.middleware.proxy_fix import ProxyFix
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
 
-# This is needed for Vercel to find the app
-app = app
+# For local development
+if __name__ == '__main__':
+    app.run(debug=os.getenv('FLASK_DEBUG', '0') == '1', threaded=True)
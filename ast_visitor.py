@@ -0,0 +1,590 @@
+"""The AST checks behind PythonHabitAnalyzer, run in a single walk over the tree.
+
+Everything here is a plain, fully annotated module-level function so the
+module can be compiled with mypyc (see the README); it imports and behaves
+the same either way.
+"""
+import ast
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Issue categories (the same values as the PythonHabitAnalyzer constants)
+SYNTAX_ERROR = 'syntax_error'       # Syntax errors that prevent code from running
+RUNTIME_ERROR = 'runtime_error'     # Errors that occur during execution
+FATAL_ERROR = 'fatal_error'         # Errors that will definitely crash the program
+BAD_HABIT = 'bad_habit'             # Not an error but a bad practice
+POTENTIAL_ERROR = 'potential_error' # Could become an error in certain conditions
+
+# Method names that count as logging inside an except block
+LOG_METHODS = frozenset({'debug', 'info', 'warning', 'error', 'critical', 'exception'})
+
+# Built-in names whose shadowing is reported, and the ones whose shadowing
+# is more likely to break something
+SHADOWABLE_BUILTINS = frozenset({
+    'list', 'dict', 'set', 'tuple', 'int', 'float', 'str', 'bool', 'type',
+    'object', 'file', 'open', 'input', 'print', 'range', 'enumerate',
+    'len', 'max', 'min', 'sum', 'filter', 'map', 'zip'
+})
+CRITICAL_BUILTINS = frozenset({'open', 'print', 'input', 'len', 'str', 'int', 'float'})
+
+# AST node classes are never subclassed, so the checks compare exact types
+# (type(node) is ast.Name, or membership in these sets) rather than paying
+# for isinstance()
+MUTABLE_LITERAL_TYPES = frozenset({ast.List, ast.Dict, ast.Set})
+JUMP_TYPES = frozenset({ast.Return, ast.Break, ast.Continue})
+# Statements with side effects; a call statement is an ast.Expr around an
+# ast.Call, which check_unreachable_code tests for separately
+SIDE_EFFECT_TYPES = frozenset({ast.Assign, ast.AugAssign})
+
+Frame = Dict[str, Any]
+Feedback = List[Dict[str, Any]]
+
+
+class State:
+    """Context gathered by one walk over a tree, and the feedback it produced.
+
+    Node maps are keyed by id(node); the tree outlives the analysis.
+    """
+
+    def __init__(self) -> None:
+        self.feedback: Feedback = []
+        # Context for the rest of the analyzer
+        self.variables: Dict[str, int] = {}       # variable name -> number of assignments
+        self.functions: Dict[str, Frame] = {}     # function name -> its frame, plus call count
+        self.control_flow: List[ast.AST] = []     # loops and conditionals, in walk order
+        # Working state shared by the node handlers during the walk
+        self.file_closes: Dict[str, List[int]] = {}                    # variable name -> lines where name.close() is called
+        self.shadowed_builtins: Dict[str, List[Dict[str, Any]]] = {}   # builtin name -> places it is shadowed
+        self.mutable_default_funcs: List[ast.FunctionDef] = []         # functions to check once all calls have been counted
+        self.infinite_loops: List[ast.While] = []                      # while True loops, checked once their bodies have been seen
+        self.unmanaged_opens: List[ast.Call] = []                      # open() calls outside a with statement
+        self.call_sites: Dict[str, List[ast.Call]] = {}                # name -> calls of the form "name(...)"
+        self.parents: Dict[int, ast.AST] = {}          # node -> parent node
+        self.enclosing_frame: Dict[int, ast.AST] = {}  # node -> nearest FunctionDef or While above it
+        self.enclosing_with: Dict[int, ast.AST] = {}   # node -> nearest With above it
+        self.frames: Dict[int, Frame] = {}             # FunctionDef/While -> flags describing everything inside it
+
+
+def run_ast_analysis(tree: ast.AST) -> State:
+    """Analyze a parsed tree for critical runtime issues with context awareness."""
+    state = State()
+    parents = state.parents
+    enclosing_frame = state.enclosing_frame
+    enclosing_with = state.enclosing_with
+
+    try:
+        # One breadth-first walk over the tree (the same order as
+        # ast.walk): each node goes to the handlers registered for its
+        # type instead of every check walking the whole tree again. Parent
+        # and enclosing frame/with links are recorded on the way down,
+        # so they are always known by the time a node's handlers run.
+        todo = deque([tree])
+        while todo:
+            node = todo.popleft()
+            node_id = id(node)
+            node_type = type(node)
+            frame = node if node_type in FRAME_TYPES else enclosing_frame.get(node_id)
+            with_node = node if node_type is ast.With else enclosing_with.get(node_id)
+
+            # The same children in the same order as ast.iter_child_nodes,
+            # without its two layers of generators
+            children: List[ast.AST] = []
+            for field_name in node._fields:
+                field = getattr(node, field_name, None)
+                if isinstance(field, ast.AST):
+                    children.append(field)
+                elif type(field) is list:
+                    children.extend([item for item in field if isinstance(item, ast.AST)])
+
+            for child in children:
+                child_id = id(child)
+                parents[child_id] = node
+                if frame is not None:
+                    enclosing_frame[child_id] = frame
+                if with_node is not None:
+                    enclosing_with[child_id] = with_node
+                todo.append(child)
+
+            for handler in HANDLERS.get(node_type, ()):
+                handler(node, state)
+
+        # These checks depend on context that is only complete after the
+        # walk: call counts, and the flags gathered from each frame's body
+        check_mutable_defaults(state)
+        check_infinite_loops(state)
+        check_resource_management(state)
+        check_shadowing_builtins(state)
+
+    except Exception as e:
+        state.feedback.append({
+            'line': 0,
+            'message': f'Error during AST analysis: {str(e)}',
+            'is_bad_habit': False,
+            'category': RUNTIME_ERROR,
+            'source': 'system'
+        })
+
+    return state
+
+
+# Frames: functions and while loops collect flags about the nodes inside
+# them as the walk reaches those nodes, so checks never re-walk a subtree
+
+FRAME_TYPES = (ast.FunctionDef, ast.While)
+
+# Node types that set a plain flag on every frame around them
+FRAME_FLAGS: Dict[type, str] = {
+    ast.Break: 'has_break',
+    ast.Return: 'has_return',
+    ast.Raise: 'has_raise',
+    ast.If: 'has_if',
+}
+
+
+def new_frame() -> Frame:
+    """Return the flags for a function or while loop before anything inside it is seen."""
+    return {
+        'has_return': False,
+        'has_break': False,
+        'has_raise': False,
+        'has_sys_exit': False,
+        'has_if': False,
+        'has_try_finally': False,
+        'assigned_names': set(),    # names assigned with a plain "name = ..."
+        'called_names': set(),      # names called as "name(...)"
+        'exception_handlers': []
+    }
+
+
+def enclosing_frames(node: ast.AST, state: State) -> Iterator[Frame]:
+    """Yield the frames around a node, innermost first."""
+    frames = state.frames
+    enclosing_frame = state.enclosing_frame
+    frame_node = enclosing_frame.get(id(node))
+    while frame_node is not None:
+        yield frames[id(frame_node)]
+        frame_node = enclosing_frame.get(id(frame_node))
+
+
+def enclosing_function(node: ast.AST, state: State) -> Optional[ast.AST]:
+    """Return the nearest FunctionDef around a node, or None."""
+    enclosing_frame = state.enclosing_frame
+    frame_node = enclosing_frame.get(id(node))
+    while frame_node is not None and type(frame_node) is not ast.FunctionDef:
+        frame_node = enclosing_frame.get(id(frame_node))
+    return frame_node
+
+
+def enclosing_statement(node: ast.AST, state: State) -> Optional[ast.AST]:
+    """Return the statement a node is part of (the node itself if it is one)."""
+    parents = state.parents
+    current: Optional[ast.AST] = node
+    while current is not None and not isinstance(current, ast.stmt):
+        current = parents.get(id(current))
+    return current
+
+
+def open_loop_frame(node: ast.While, state: State) -> None:
+    state.frames[id(node)] = new_frame()
+
+
+def mark_frames(node: ast.AST, state: State) -> None:
+    flag = FRAME_FLAGS[type(node)]
+    for frame in enclosing_frames(node, state):
+        frame[flag] = True
+
+
+def mark_call(node: ast.Call, state: State) -> None:
+    func = node.func
+    if type(func) is ast.Name:
+        for frame in enclosing_frames(node, state):
+            frame['called_names'].add(func.id)
+    # Check for sys.exit() calls
+    elif type(func) is ast.Attribute and func.attr == 'exit':
+        for frame in enclosing_frames(node, state):
+            frame['has_sys_exit'] = True
+
+
+def mark_assign(node: ast.Assign, state: State) -> None:
+    names = [target.id for target in node.targets if type(target) is ast.Name]
+    if names:
+        for frame in enclosing_frames(node, state):
+            frame['assigned_names'].update(names)
+
+
+def mark_try(node: ast.Try, state: State) -> None:
+    if node.finalbody:
+        for frame in enclosing_frames(node, state):
+            frame['has_try_finally'] = True
+
+
+def mark_exception_handler(node: ast.ExceptHandler, state: State) -> None:
+    for frame in enclosing_frames(node, state):
+        frame['exception_handlers'].append(node)
+
+
+# Context handlers
+
+def context_assign(node: ast.Assign, state: State) -> None:
+    """Track variable assignments."""
+    variables = state.variables
+    for target in node.targets:
+        if type(target) is ast.Name:
+            var_name = target.id
+            # Track if the variable is reassigned
+            variables[var_name] = variables.get(var_name, 0) + 1
+
+
+def context_function(node: ast.FunctionDef, state: State) -> None:
+    """Track function definitions and their usage."""
+    func_name = node.name
+    # The function's frame doubles as its context entry; returns, breaks
+    # and exception handlers inside it are flagged as the walk reaches them
+    func_info = new_frame()
+    func_info.update({
+        'node': node,
+        'calls': 0,
+        'has_mutable_defaults': False
+    })
+    state.functions[func_name] = state.frames[id(node)] = func_info
+
+    # Check for mutable defaults
+    for arg in node.args.defaults:
+        if type(arg) in MUTABLE_LITERAL_TYPES:
+            func_info['has_mutable_defaults'] = True
+
+
+def context_call(node: ast.Call, state: State) -> None:
+    """Track function calls."""
+    if type(node.func) is ast.Name:
+        func_name = node.func.id
+        state.call_sites.setdefault(func_name, []).append(node)
+        if func_name in state.functions:
+            state.functions[func_name]['calls'] += 1
+
+
+def context_control_flow(node: ast.AST, state: State) -> None:
+    """Track loops and conditionals for control flow analysis."""
+    state.control_flow.append(node)
+
+
+# Check handlers
+
+def collect_mutable_default_function(node: ast.FunctionDef, state: State) -> None:
+    """Remember a function so its defaults are checked once all calls are counted."""
+    state.mutable_default_funcs.append(node)
+
+
+def check_mutable_defaults(state: State) -> None:
+    """Check for functions with mutable default arguments which cause unexpected behavior."""
+    for node in state.mutable_default_funcs:
+        func_name = node.name
+        for arg in node.args.defaults:
+            if type(arg) in MUTABLE_LITERAL_TYPES:
+                # Check if this might be intentional by looking at function usage
+                category = RUNTIME_ERROR  # Default to runtime error
+
+                # If the function is in our context and we have info about it
+                if func_name in state.functions:
+                    func_info = state.functions[func_name]
+
+                    # If the function reassigns the mutable default, it might be intentional
+                    reassigns_default = False
+                    assigned_names = state.frames[id(node)]['assigned_names']
+                    for i, arg_node in enumerate(node.args.args):
+                        if i < len(node.args.defaults) and type(arg_node) is ast.arg:
+                            # Check if this argument is reassigned in the function body
+                            if arg_node.arg in assigned_names:
+                                reassigns_default = True
+
+                    # If the function is called multiple times or reassigns the default
+                    if func_info['calls'] > 1 or reassigns_default:
+                        category = POTENTIAL_ERROR
+                    # If it's a common pattern but not causing issues yet
+                    else:
+                        category = BAD_HABIT
+
+                state.feedback.append({
+                    'line': node.lineno,
+                    'message': f'Function "{node.name}" uses mutable default argument ([], {{}}, or set()). This will be shared across all function calls, causing unexpected behavior when modified.',
+                    'is_bad_habit': True,
+                    'category': category,
+                    'source': 'ast'
+                })
+
+
+def collect_infinite_loop(node: ast.While, state: State) -> None:
+    """Remember while loops with a constant True condition to check once their bodies are seen."""
+    if type(node.test) is ast.Constant:
+        if node.test.value is True:
+            state.infinite_loops.append(node)
+
+
+def check_infinite_loops(state: State) -> None:
+    """Check for potential infinite loops with context awareness."""
+    for node in state.infinite_loops:
+        loop = state.frames[id(node)]
+
+        # Determine category based on context: a break, return, raise or
+        # sys.exit() anywhere inside the loop can end it
+        if not (loop['has_break'] or loop['has_return'] or loop['has_raise'] or loop['has_sys_exit']):
+            # If no exit condition is found, it's a fatal error
+            # If there's a complex condition, it might be intentional
+            category = POTENTIAL_ERROR if loop['has_if'] else FATAL_ERROR
+
+            state.feedback.append({
+                'line': node.lineno,
+                'message': 'Infinite loop detected (while True without break). This will cause your program to hang indefinitely.',
+                'is_bad_habit': True,
+                'category': category,
+                'source': 'ast'
+            })
+
+
+def check_exception_handler(node: ast.ExceptHandler, state: State) -> None:
+    """Check an except clause for overly broad exception handling with context awareness."""
+    if node.type is None or (type(node.type) is ast.Name and node.type.id == 'Exception'):
+        # Check if the except block is just passing or too generic
+        is_just_pass = False
+        has_logging = False
+        has_print = False
+        has_reraise = False
+
+        # Check the body of the except handler
+        if len(node.body) == 1 and type(node.body[0]) is ast.Pass:
+            is_just_pass = True
+
+        # Look for logging, printing, or re-raising in the except block
+        for stmt in node.body:
+            # Check for logging calls
+            if type(stmt) is ast.Expr and type(stmt.value) is ast.Call:
+                func = stmt.value.func
+                if type(func) is ast.Attribute and func.attr in LOG_METHODS:
+                    has_logging = True
+                # Check for print calls
+                elif type(func) is ast.Name and func.id == 'print':
+                    has_print = True
+            # Check for re-raising
+            elif type(stmt) is ast.Raise:
+                has_reraise = True
+
+        # Determine category based on context
+        if is_just_pass:
+            # Bare except with pass is always bad
+            category = RUNTIME_ERROR
+
+            # If it's in a try-except-finally block with cleanup, might be intentional
+            parent = state.parents.get(id(node))
+            if parent and getattr(parent, 'finalbody', None):
+                category = BAD_HABIT
+
+            state.feedback.append({
+                'line': node.lineno,
+                'message': 'Catching all exceptions with a bare except: pass will silence critical errors, making bugs extremely difficult to diagnose.',
+                'is_bad_habit': True,
+                'category': category,
+                'source': 'ast'
+            })
+        else:
+            # If there's logging, printing, or re-raising, it might be intentional
+            if has_logging or has_print or has_reraise:
+                category = BAD_HABIT
+            else:
+                # Generic exception handling without proper handling is a potential error
+                category = POTENTIAL_ERROR
+
+            state.feedback.append({
+                'line': node.lineno,
+                'message': 'Catching all exceptions with a bare except or except Exception can mask critical errors. Catch specific exceptions instead.',
+                'is_bad_habit': True,
+                'category': category,
+                'source': 'ast'
+            })
+
+
+def track_file_close(node: ast.Expr, state: State) -> None:
+    """Track close() calls on variables."""
+    value = node.value
+    if type(value) is ast.Call:
+        func = value.func
+        if type(func) is ast.Attribute and func.attr == 'close':
+            if type(func.value) is ast.Name:
+                state.file_closes.setdefault(func.value.id, []).append(node.lineno)
+
+
+def check_open_call(node: ast.Call, state: State) -> None:
+    """Check for file operations without context managers (resource management)."""
+    if type(node.func) is ast.Name:
+        if node.func.id == 'open':
+            # Open calls outside a with statement are resolved once the walk
+            # has seen every close() call
+            if id(node) not in state.enclosing_with:
+                state.unmanaged_opens.append(node)
+
+
+def is_closed_later(node: ast.Call, state: State) -> bool:
+    """Return True if an open() call is directly assigned to a variable that is closed on the same or a later line."""
+    parent = state.parents.get(id(node))
+    if type(parent) is not ast.Assign or len(parent.targets) != 1:
+        return False
+    target = parent.targets[0]
+    if type(target) is not ast.Name:
+        return False
+    return any(line >= node.lineno for line in state.file_closes.get(target.id, ()))
+
+
+def check_resource_management(state: State) -> None:
+    """Check for proper resource management (files, connections, etc.) with context awareness."""
+    for node in state.unmanaged_opens:
+        if is_closed_later(node, state):
+            continue
+
+        # Determine category based on context
+        category = RUNTIME_ERROR  # Default to runtime error
+
+        # If it's in a function that has a try-finally, might be closed there
+        parent_func = enclosing_function(node, state)
+
+        if parent_func:
+            if state.frames[id(parent_func)]['has_try_finally']:
+                # If there's a try-finally, it's more likely a bad habit than an error
+                category = BAD_HABIT
+        else:
+            # If not in a function with try-finally, it's a potential resource leak
+            category = POTENTIAL_ERROR
+
+        state.feedback.append({
+            'line': node.lineno,
+            'message': 'File opened without using a context manager (with statement). This can lead to resource leaks if the file is not properly closed.',
+            'is_bad_habit': True,
+            'category': category,
+            'source': 'ast'
+        })
+
+
+def check_unreachable_code(node: Any, state: State) -> None:
+    """Check a function or loop body for unreachable code after return/break/continue statements with context awareness."""
+    body: List[ast.stmt] = node.body
+    # Collect the statements after the first return/break/continue
+    terminator_idx: Optional[int] = None
+    unreachable_stmts: List[ast.stmt] = []
+    for i, stmt in enumerate(body):
+        if terminator_idx is not None:
+            unreachable_stmts.append(stmt)
+        elif type(stmt) in JUMP_TYPES:
+            terminator_idx = i
+
+    if unreachable_stmts:
+        # Default category - this is a bad habit but not necessarily an error
+        category = BAD_HABIT
+        unreachable_line = getattr(unreachable_stmts[0], 'lineno', node.lineno)
+
+        # If the unreachable code contains important operations, it's more serious
+        for stmt in unreachable_stmts:
+            if type(stmt) is ast.Return:
+                # Return statement that will never execute - runtime error
+                category = RUNTIME_ERROR
+                break
+            elif type(stmt) in SIDE_EFFECT_TYPES or (type(stmt) is ast.Expr and type(stmt.value) is ast.Call):
+                # Important operations that will never execute - potential error
+                category = POTENTIAL_ERROR
+
+        state.feedback.append({
+            'line': unreachable_line,
+            'message': 'Unreachable code detected after return, break, or continue statement. This code will never execute.',
+            'is_bad_habit': True,
+            'category': category,
+            'source': 'ast'
+        })
+
+
+def collect_shadowing_assign(node: ast.Assign, state: State) -> None:
+    """Collect assignments that shadow a built-in."""
+    shadowed_builtins = state.shadowed_builtins
+    for target in node.targets:
+        if type(target) is ast.Name and target.id in SHADOWABLE_BUILTINS:
+            if target.id not in shadowed_builtins:
+                shadowed_builtins[target.id] = []
+            shadowed_builtins[target.id].append({
+                'node': node,
+                'type': 'variable',
+                'uses': 0
+            })
+
+
+def collect_shadowing_params(node: ast.FunctionDef, state: State) -> None:
+    """Collect function parameters that shadow a built-in."""
+    shadowed_builtins = state.shadowed_builtins
+    for arg in node.args.args:
+        if arg.arg in SHADOWABLE_BUILTINS:
+            if arg.arg not in shadowed_builtins:
+                shadowed_builtins[arg.arg] = []
+            shadowed_builtins[arg.arg].append({
+                'node': node,
+                'type': 'parameter',
+                'uses': 0
+            })
+
+
+def check_shadowing_builtins(state: State) -> None:
+    """Check for variable names that shadow Python built-ins with context awareness."""
+    # Check for usage of shadowed builtins
+    for builtin_name, instances in state.shadowed_builtins.items():
+        for instance in instances:
+            node = instance['node']
+
+            # Default to bad habit - shadowing is usually just a style issue
+            category = BAD_HABIT
+
+            # Check if the original builtin is used after shadowing, which would cause bugs
+            if instance['type'] == 'parameter':
+                # The function itself is the scope
+                tries_to_use_original = builtin_name in state.frames[id(node)]['called_names']
+            else:
+                # Only the assignment statement itself, e.g. "list = list(items)"
+                tries_to_use_original = any(
+                    enclosing_statement(call, state) is node
+                    for call in state.call_sites.get(builtin_name, ())
+                )
+
+            # If trying to use the original after shadowing, it's a runtime error
+            if tries_to_use_original:
+                category = RUNTIME_ERROR
+            # If shadowing critical builtins like 'open', 'print', it's a potential error
+            elif builtin_name in CRITICAL_BUILTINS:
+                category = POTENTIAL_ERROR
+
+            if instance['type'] == 'variable':
+                state.feedback.append({
+                    'line': node.lineno,
+                    'message': f'Variable name "{builtin_name}" shadows a Python built-in. This will prevent you from using the original built-in function in this scope.',
+                    'is_bad_habit': True,
+                    'category': category,
+                    'source': 'ast'
+                })
+            else:  # parameter
+                state.feedback.append({
+                    'line': node.lineno,
+                    'message': f'Function parameter "{builtin_name}" shadows a Python built-in. This will prevent you from using the original built-in function inside this function.',
+                    'is_bad_habit': True,
+                    'category': category,
+                    'source': 'ast'
+                })
+
+
+# Handlers run for each node type during the walk, in this order
+HANDLERS: Dict[type, Tuple[Callable[[Any, State], None], ...]] = {
+    ast.Assign: (mark_assign, context_assign, collect_shadowing_assign),
+    ast.FunctionDef: (context_function, collect_mutable_default_function,
+                      check_unreachable_code, collect_shadowing_params),
+    ast.Call: (mark_call, context_call, check_open_call),
+    ast.For: (context_control_flow, check_unreachable_code),
+    ast.While: (open_loop_frame, context_control_flow, collect_infinite_loop, check_unreachable_code),
+    ast.If: (mark_frames, context_control_flow),
+    ast.Break: (mark_frames,),
+    ast.Return: (mark_frames,),
+    ast.Raise: (mark_frames,),
+    ast.Try: (mark_try,),
+    ast.ExceptHandler: (mark_exception_handler, check_exception_handler),
+    ast.Expr: (track_file_close,),
+}
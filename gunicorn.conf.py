@@ -0,0 +1,17 @@
+# Gunicorn configuration for running the analyzer outside of Vercel
+# Usage: gunicorn -c gunicorn.conf.py app:app
+import os
+import multiprocessing
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# /analyze spends most of its time waiting on Claude API calls, so use
+# threaded workers: while one request waits on a socket read the worker's
+# other threads keep serving requests instead of the whole process blocking.
+worker_class = 'gthread'
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+
+# Explanations for a large snippet can take a while to come back
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+keepalive = 5
@@ -51,7 +51,9 @@ document.addEventListener('DOMContentLoaded', function() {
             const response = await fetch('/analyze', {
                 method: 'POST',
                 headers: {
-                    'Content-Type': 'application/json'
+                    'Content-Type': 'application/json',
+                    // Ask for the analysis first and each explanation as it arrives
+                    'Accept': 'application/x-ndjson'
                 },
                 body: JSON.stringify({ code })
             });
@@ -61,22 +63,48 @@ document.addEventListener('DOMContentLoaded', function() {
                 throw new Error(`HTTP error! Status: ${response.status}`);
             }
             
-            const data = await response.json();
-            console.log('Received analysis results:', data);
-            console.log('Number of feedback items:', data.feedback.length);
+            let feedback = [];
+            if ((response.headers.get('Content-Type') || '').includes('application/x-ndjson')) {
+                await readNdjson(response, message => {
+                    if (message.feedback) {
+                        // Show the issues right away; explanations fill in as they arrive
+                        feedback = message.feedback;
+                        console.log('Received analysis results:', feedback);
+                        displayResults(feedback);
+                    } else if (message.index !== undefined) {
+                        feedback[message.index].explanation = message.explanation;
+                        feedback[message.index].fix = message.fix;
+                        displayResults(feedback);
+                    } else if (message.error) {
+                        feedback.push({
+                            line: 0,
+                            message: message.error,
+                            category: 'syntax_error',
+                            source: 'system',
+                            explanation: null,
+                            fix: null
+                        });
+                    }
+                });
+            } else {
+                const data = await response.json();
+                console.log('Received analysis results:', data);
+                feedback = data.feedback;
+            }
+            console.log('Number of feedback items:', feedback.length);
             
             // Check if any items have explanations
-            const hasExplanations = data.feedback.some(item => item.explanation);
+            const hasExplanations = feedback.some(item => item.explanation);
             console.log('Has explanations from Claude:', hasExplanations);
             
-            if (!hasExplanations && data.feedback.length > 0) {
+            if (!hasExplanations && feedback.length > 0) {
                 console.warn('No explanations found in the feedback items. Claude API may not be working.');
-                data.feedback.forEach((item, index) => {
+                feedback.forEach((item, index) => {
                     console.log(`Item ${index + 1}:`, item);
                 });
                 
                 // Check if there's already a system message about Claude API
-                const hasSystemMessage = data.feedback.some(item => 
+                const hasSystemMessage = feedback.some(item => 
                     item.source === 'system' && 
                     item.message && 
                     item.message.includes('Claude API')
@@ -85,7 +113,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 // Only add the system message if there isn't one already
                 if (!hasSystemMessage) {
                     // Add a system message about Claude API not working
-                    data.feedback.push({
+                    feedback.push({
                         line: 0,
                         message: 'Claude API is not providing explanations. This could be due to environment variables not being set correctly or API rate limits.',
                         category: 'syntax_error',
@@ -99,7 +127,7 @@ document.addEventListener('DOMContentLoaded', function() {
             // If no feedback items, just display empty results (no message needed)
             // The empty results will indicate the code is good
             
-            displayResults(data.feedback);
+            displayResults(feedback);
         } catch (error) {
             console.error('Error during analysis:', error);
             showMessage(`Error: ${error.message}`);
@@ -109,6 +137,31 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    // Function to read a newline-delimited JSON response, calling onMessage
+    // with each parsed line as soon as it arrives
+    async function readNdjson(response, onMessage) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffer += decoder.decode(value, { stream: true });
+            
+            // Keep any partial last line until the rest of it arrives
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.filter(line => line.trim()).forEach(line => onMessage(JSON.parse(line)));
+        }
+        
+        if (buffer.trim()) {
+            onMessage(JSON.parse(buffer));
+        }
+    }
+
     // Function to display analysis results
     function displayResults(feedback) {
         // Clear previous results
@@ -202,9 +255,6 @@ document.addEventListener('DOMContentLoaded', function() {
                 } else if (item.category) {
                     // Use the category to determine the class
                     feedbackItem.className = `feedback-item ${item.category}`;
-                } else if (item.certainty === 'might_error') {
-                    // Backward compatibility
-                    feedbackItem.className = 'feedback-item potential_error';
                 } else {
                     feedbackItem.className = 'feedback-item runtime_error';
                 }
@@ -264,10 +314,6 @@ document.addEventListener('DOMContentLoaded', function() {
                 } else if (item.category === 'potential_error') {
                     categorySpan.textContent = 'COULD BECOME ERROR: ';
                     categorySpan.className += ' potential-error-label';
-                } else if (item.certainty === 'might_error') {
-                    // Backward compatibility
-                    categorySpan.textContent = 'MIGHT ERROR: ';
-                    categorySpan.className += ' potential-error-label';
                 } else {
                     categorySpan.textContent = 'ERROR: ';
                     categorySpan.className += ' runtime-error-label';
@@ -1,21 +1,19 @@
 import os
 import json
+import re
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Get all environment variables
-env_vars = dict(os.environ)
+# Don't include API keys or tokens in the output
+SECRET_RE = re.compile(r'key|token|secret|password', re.IGNORECASE)
 
 # Filter out sensitive information
-filtered_env = {}
-for key, value in env_vars.items():
-    # Don't include API keys or tokens in the output
-    if 'key' in key.lower() or 'token' in key.lower() or 'secret' in key.lower() or 'password' in key.lower():
-        filtered_env[key] = f"[REDACTED] (Length: {len(value)})"
-    else:
-        filtered_env[key] = value
+filtered_env = {
+    key: f"[REDACTED] (Length: {len(value)})" if SECRET_RE.search(key) else value
+    for key, value in os.environ.items()
+}
 
 # Print environment variables
 print("Environment Variables:")